@@ -1,64 +1,391 @@
 import random
+import time
+import bitboard
+import tablebase
+import transposition
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Fixed search depth for each difficulty level
+LEVEL_DEPTHS = {"easy": 1, "medium": 2, "hard": 4}
+
+# Deepest iteration a timed search will try
+MAX_DEPTH = 64
+
+# Number of nodes searched between clock checks
+TIME_CHECK_INTERVAL = 256
+
+# Deepest ply that keeps killer moves
+MAX_PLY = 128
+
+# Evaluation weights, on top of material from Position (man 1, king 3)
+CENTER_WEIGHT = 0.5
+MOBILITY_WEIGHT = 0.1
+NOISE = 0.1
+
+# Score of a position the tablebases show the AI wins, less one per ply it
+# takes; a loss scores the negative
+TABLEBASE_WIN_SCORE = 1000
+# Scores further from zero than this come from the tablebases. They count
+# plies from the root, so the transposition table keeps them counted from
+# the node instead, to stay right at another ply or in a later search
+TABLEBASE_SCORE_FLOOR = TABLEBASE_WIN_SCORE // 2
+
+# Principal variation search: width of the window that tests whether a move
+# beats the best one so far, and the half-width of the aspiration window
+# around the previous iteration's score
+NULL_WINDOW = 1e-6
+ASPIRATION_WINDOW = 1.0
+
+# Move ordering scores inside the search; quiet moves that are not killers
+# are ordered by their history score, which stays below these
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 29
+KILLER_SCORES = (1 << 28, 1 << 27)
+
+
+class SearchTimeout(Exception):
+    pass
+
 
 class AI:
-    def __init__(self, board, level="easy"):
+    def __init__(self, board, level="easy", time_limit_ms=None, workers=None, depth=None, quiescence=True,
+                 batch_eval=False, book=None, tablebases=None, side=bitboard.AI, center_weight=CENTER_WEIGHT,
+                 mobility_weight=MOBILITY_WEIGHT, tt_path=None, pvs=False):
         self.board = board
+        # The side get_best_move plays. The search always plays the AI, so
+        # the Player's positions are mirrored first
+        self.side = side
+        self.center_weight = center_weight
+        self.mobility_weight = mobility_weight
+        self.piece_tables = None
         self.level = level
-        self.transposition_table = {}
+        # Fixed search depth, overriding the level's
+        self.depth = depth if depth is not None else LEVEL_DEPTHS[level]
+        # When set, search by iterative deepening for this many milliseconds
+        # per move instead of to the level's fixed depth
+        self.time_limit_ms = time_limit_ms
+        # When set, root moves are spread over this many worker processes
+        self.workers = workers
+        # Follow captures past the search horizon until the position is quiet
+        self.quiescence = quiescence
+        # Principal variation search: only the first move of a node gets the
+        # full window, and iterations start from an aspiration window
+        self.pvs = pvs
+        # Score the children of nodes just above the horizon in one NumPy
+        # call (needs numpy)
+        self.batch_eval = batch_eval
+        # Path of an opening book whose moves are played without searching
+        self.book_path = book
+        self.book = None
+        if book is not None:
+            import book as opening_book
+            self.book = opening_book.load(book)
+        # Directory of endgame tablebases probed at the root and inside the
+        # search
+        self.tablebases_path = tablebases
+        self.tablebases = None
+        if tablebases is not None:
+            self.tablebases = tablebase.load(tablebases)
+        self.parallel_search = None
+        # In a parallel search worker, the shared best root score, read at
+        # each clock check into root_alpha, which every node's alpha is
+        # raised to
+        self.shared_alpha = None
+        self.root_alpha = float('-inf')
+        # Path of a memory-mapped transposition table file that keeps its
+        # entries between runs and shares them with other processes
+        self.tt_path = tt_path
+        if tt_path is not None:
+            self.transposition_table = transposition.PersistentTranspositionTable(tt_path)
+        else:
+            self.transposition_table = transposition.TranspositionTable()
+        # Two quiet moves per ply that recently caused a beta cutoff, and a
+        # from/to table of how much cutoffs each quiet move has produced
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * bitboard.SQUARES for _ in range(bitboard.SQUARES)]
+        self.deadline = None
+        # Optional threading/multiprocessing Event that cancels a search
+        # running in the background when set
+        self.stop_event = None
+        # Optional callback on_iteration(depth, move, score) made after each
+        # completed search depth, to report progress
+        self.on_iteration = None
+        self._reset_counters()
+        self.depth_reached = 0
+        self.search_seconds = 0.0
+        # Score of the last search's best move, from the AI's point of view;
+        # None for book moves
+        self.best_score = None
+
+    # Counters of the work done by the last search, summed over the
+    # iterations of a timed search and over the workers of a parallel one
+    COUNTERS = ("nodes", "tt_probes", "tt_hits", "beta_cutoffs", "first_move_cutoffs", "tb_hits")
+
+    def _reset_counters(self):
+        self.nodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tb_hits = 0
+
+    def counters(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def add_counters(self, counters):
+        for name, value in counters.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def search_stats(self):
+        """Statistics of the last search, for benchmarks."""
+        stats = self.counters()
+        stats["depth"] = self.depth_reached
+        stats["seconds"] = self.search_seconds
+        stats["nps"] = self.nodes / self.search_seconds if self.search_seconds > 0 else 0.0
+        # The b for which b + b^2 + ... + b^depth equals the node count
+        stats["branching_factor"] = _effective_branching_factor(self.nodes, self.depth_reached)
+        stats["first_move_cutoff_rate"] = \
+            self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+        return stats
 
     def get_best_move(self):
-        all_moves = self.board.get_all_valid_moves("AI")
+        # Search on a bitboard copy; the Board is only read here at the root
+        position = bitboard.Position.from_board(self.board)
+        if self.side == bitboard.PLAYER:
+            position = position.mirrored()
+        best_move = self.search(position)
+        if best_move is None:
+            return None
+        if self.side == bitboard.PLAYER:
+            best_move = bitboard.Position.mirror_move(best_move)
+        return bitboard.Position.to_board_move(best_move)
+
+    def search(self, position):
+        """Returns the AI's best (from_square, to_square) move in a bitboard
+        position, or None if it has no moves."""
+        self.position = position
+        self.transposition_table.new_search()
+        self._new_search_ordering()
+        self._reset_counters()
+        self.depth_reached = 0
+        self.search_seconds = 0.0
+        self.best_score = None
+        all_moves = self.position.get_all_valid_moves(bitboard.AI)
         if not all_moves:
             print("[DEBUG] AI: No valid moves available.")
             return None
 
         print(f"[DEBUG] AI: Found {len(all_moves)} valid moves.")
 
-        if self.level == "easy":
-            return self._get_minimax_move(all_moves, depth=1)
-        elif self.level == "medium":
-            return self._get_minimax_move(all_moves, depth=2)
-        elif self.level == "hard":
-            return self._get_minimax_move(all_moves, depth=4)
-
-    def _evaluate_board(self, board):
-        score = 0
-        for row in board.boardArray:
-            for piece in row:
-                if piece:
-                    base_score = 3 if piece.isKing else 1
-                    if piece.player == "AI":
-                        score += base_score
-                        # Reward central positioning
-                        if 2 <= piece.row <= 5 and 2 <= piece.col <= 5:
-                            score += 0.5
-                    else:
-                        score -= base_score
-                        # Penalize central positioning for opponent
-                        if 2 <= piece.row <= 5 and 2 <= piece.col <= 5:
-                            score -= 0.5
+        if self.book is not None:
+            book_move = self.book.choose(self.position)
+            if book_move is not None:
+                print("[DEBUG] AI: Playing a book move.")
+                return book_move
+
+        if self.tablebases is not None:
+            tablebase_move = self._tablebase_move(self.position, all_moves)
+            if tablebase_move is not None:
+                print("[DEBUG] AI: Playing a tablebase move.")
+                return tablebase_move
+
+        start = time.perf_counter()
+        if self.time_limit_ms is not None:
+            best_move = self._get_timed_move(all_moves, self.time_limit_ms)
+        else:
+            best_move = self._get_minimax_move(all_moves, depth=self.depth)
+        self.search_seconds = time.perf_counter() - start
+        return best_move
+
+    def analyze(self, position):
+        """Searches position for the side to move and returns its best move,
+        score (from that side's point of view) and principal variation, with
+        the search statistics."""
+        mirrored = position.turn == bitboard.PLAYER
+        if mirrored:
+            position = position.mirrored()
+        best_move = self.search(position.copy())
+        pv = []
+        if best_move is not None:
+            pv = [best_move] + self.principal_variation(position.play(best_move))
+        if mirrored:
+            pv = [bitboard.Position.mirror_move(move) for move in pv]
+        result = {"move": pv[0] if pv else None, "score": self.best_score, "pv": pv}
+        result.update(self.search_stats())
+        return result
+
+    def principal_variation(self, position, max_length=MAX_PLY):
+        """The moves the last search expects from position on, following the
+        best moves in the transposition table."""
+        position = position.copy()
+        pv = []
+        seen = set()
+        while len(pv) < max_length and position.hash not in seen:
+            entry = self.transposition_table.probe(position.hash)
+            if entry is None or entry[4] not in position.get_all_valid_moves():
+                break
+            seen.add(position.hash)
+            pv.append(entry[4])
+            position.make_move(entry[4])
+        return pv
+
+    def options(self):
+        """Settings a worker process needs to search like this AI."""
+        return {"level": self.level, "depth": self.depth, "quiescence": self.quiescence,
+                "batch_eval": self.batch_eval, "tablebases": self.tablebases_path,
+                "center_weight": self.center_weight, "mobility_weight": self.mobility_weight,
+                "tt_path": self.tt_path, "pvs": self.pvs}
+
+    def reset(self):
+        """Forgets what earlier searches learned, so the next search does not
+        depend on them: the transposition table, killer moves and history.
+        A persistent table is shared on purpose and is kept."""
+        if self.tt_path is None:
+            self.transposition_table.clear()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * bitboard.SQUARES for _ in range(bitboard.SQUARES)]
+
+    def close(self):
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if self.tablebases is not None:
+            self.tablebases.close()
+            self.tablebases = None
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+            self.parallel_search = None
+        if self.tt_path is not None:
+            self.transposition_table.close()
+            self.tt_path = None
+            self.transposition_table = transposition.TranspositionTable()
+
+    # Material and center terms are kept up to date by make_move, and
+    # mobility is counted with popcounts, so this takes no board scan
+    def _evaluate_board(self, position):
+        score = position.material + self.center_weight * position.center
         # Add mobility as a factor
-        score += len(board.get_all_valid_moves("AI")) * 0.1
-        score -= len(board.get_all_valid_moves("Player")) * 0.1
-        return score + random.uniform(-0.1, 0.1)
+        score += (position.count_moves(bitboard.AI) - position.count_moves(bitboard.PLAYER)) * self.mobility_weight
+        return score + random.uniform(-NOISE, NOISE)
+
+    # Static scores of all the children of position at once, for nodes whose
+    # children are at the horizon
+    def _evaluate_children(self, position, moves):
+        import batch_eval
 
-    # Check if a move is a capture move
-    def _is_capture_move(self, move):
-        prev_pos, new_pos = move
-        return abs(new_pos[0] - prev_pos[0]) == 2
+        ai_bits, player_bits, kings = [], [], []
+        for move in moves:
+            undo = position.make_move(move)
+            ai_bits.append(position.ai)
+            player_bits.append(position.player)
+            kings.append(position.kings)
+            position.unmake_move(undo)
+        if self.piece_tables is None:
+            self.piece_tables = batch_eval.piece_tables(self.center_weight)
+        scores = batch_eval.evaluate(ai_bits, player_bits, kings, *self.piece_tables, self.mobility_weight)
+        return [score + random.uniform(-NOISE, NOISE) for score in scores.tolist()]
+
+    # In a tablebase position that is won or lost, plays the move that wins
+    # fastest or loses slowest; drawn positions are left to the search
+    def _tablebase_move(self, position, moves):
+        found = self.tablebases.probe(position)
+        if found is None or found[0] == tablebase.DRAW:
+            return None
+        best_move, best_score = None, float('-inf')
+        for move in moves:
+            child_found = self.tablebases.probe(position.play(move))
+            if child_found is None:
+                return None
+            score = _tablebase_score(*child_found, 1)
+            if score > best_score:
+                best_move, best_score = move, score
+        self.best_score = best_score
+        return best_move
 
     # Get best move using minimax algorithm
     def _get_minimax_move(self, moves, depth):
+        self.deadline = None
+        if self.pvs and not self.workers:
+            # Deepen to the fixed depth so each iteration has the previous
+            # one's score to centre its aspiration window on
+            best_score = None
+            for iteration in range(1, depth + 1):
+                best_move, best_score = self._search_iteration(self.position, moves, iteration, best_score)
+            self.best_score = best_score
+        else:
+            best_move, self.best_score = self._search_root(self.position, moves, depth)
+        self.depth_reached = depth
+        if self.on_iteration is not None:
+            self.on_iteration(depth, best_move, self.best_score)
+        return best_move
+
+    # Iterative deepening: search depth 1, 2, 3... until the time budget runs
+    # out and keep the best move of the deepest iteration that completed.
+    # Each iteration leaves its best moves in the transposition table, which
+    # the next one searches first.
+    def _get_timed_move(self, moves, time_limit_ms):
+        start = time.perf_counter()
+        self.deadline = None
+        best_move = None
+        best_score = None
+        for depth in range(1, MAX_DEPTH + 1):
+            try:
+                # An aborted iteration leaves its position half-played, so
+                # each iteration works on its own copy
+                best_move, best_score = self._search_iteration(self.position.copy(), moves, depth, best_score)
+            except SearchTimeout:
+                break
+            self.depth_reached = depth
+            self.best_score = best_score
+            if self.on_iteration is not None:
+                self.on_iteration(depth, best_move, best_score)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"[DEBUG] AI: Depth {depth} done in {elapsed_ms:.0f} ms, score {best_score:.2f}.")
+            if len(moves) == 1 or elapsed_ms >= time_limit_ms:
+                break
+            # The first iteration always completes so there is a move to play
+            self.deadline = start + time_limit_ms / 1000
+        return best_move
+
+    # One iteration of a deepening search. With pvs it first searches a
+    # narrow window around the previous iteration's score and widens the side
+    # it fails on; workers search the full window
+    def _search_iteration(self, position, moves, depth, previous_score):
+        if not self.pvs or self.workers or previous_score is None:
+            return self._search_root(position, moves, depth)
+        alpha = previous_score - ASPIRATION_WINDOW
+        beta = previous_score + ASPIRATION_WINDOW
+        while True:
+            best_move, best_score = self._search_root(position, moves, depth, alpha, beta)
+            if best_score <= alpha:
+                alpha = float('-inf')
+            elif best_score >= beta:
+                beta = float('inf')
+            else:
+                return best_move, best_score
+
+    def _search_root(self, position, moves, depth, alpha=float('-inf'), beta=float('inf')):
         best_move = None
         best_score = float('-inf')
-        alpha = float('-inf')
-        beta = float('inf')
-        sorted_moves = sorted(moves, key=lambda move: self._move_priority(move), reverse=True)
-
-        for move in sorted_moves:
-            board_copy = self._copy_board(self.board)
-            board_copy.apply_move(move)
-            score = self._minimax(board_copy, depth - 1, False, alpha, beta)
+        alpha_start, beta_start = alpha, beta
+        entry = self.transposition_table.probe(position.hash)
+        hash_move = entry[4] if entry is not None else None
+        sorted_moves = sorted(moves, key=lambda move: 3 if move == hash_move else self._move_priority(move),
+                              reverse=True)
+
+        if self.workers:
+            search = self._parallel_search()
+            try:
+                best_move, best_score = search.search_root(position, sorted_moves, depth, self.deadline)
+            finally:
+                self.add_counters(search.counters)
+            self.transposition_table.store(position.hash, depth, EXACT, best_score, best_move)
+            return best_move, best_score
+
+        for index, move in enumerate(sorted_moves):
+            undo = position.make_move(move)
+            score = self._search_child(position, depth - 1, True, alpha, beta, index)
+            position.unmake_move(undo)
             
             if score > best_score:
                 best_score = score
@@ -68,75 +395,255 @@ class AI:
             if alpha >= beta:
                 break
 
-        return best_move
+        if best_score <= alpha_start:
+            bound = UPPER_BOUND
+        elif best_score >= beta_start:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.transposition_table.store(position.hash, depth, bound, best_score, best_move)
+        return best_move, best_score
+
+    def _parallel_search(self):
+        if self.parallel_search is None:
+            import parallel
+            self.parallel_search = parallel.ParallelSearch(self.workers, self.options())
+        return self.parallel_search
 
     def _move_priority(self, move):
-        if self._is_capture_move(move):
+        if bitboard.Position.is_capture_move(move):
             return 2
-        if self.board.is_kinging_move(move):
+        if self.position.is_kinging_move(move):
             return 1.5
         return 1
 
-    # Minimax with alpha-beta pruning
-    def _minimax(self, board, depth, is_maximizing, alpha, beta):
-        board_key = self._board_to_key(board)
-        if board_key in self.transposition_table:
-            return self.transposition_table[board_key]
+    # Aborts the search when its deadline has passed or it was cancelled
+    def _check_time(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+        if self.shared_alpha is not None:
+            self.root_alpha = max(self.root_alpha, self.shared_alpha.value)
+
+    def _new_search_ordering(self):
+        # Killers are specific to a position's tree, history carries over at
+        # half weight so it keeps adapting as the game moves on
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        for row in self.history:
+            for index in range(len(row)):
+                row[index] >>= 1
+
+    # Orders moves inside the search: the transposition table's best move,
+    # then captures, then this ply's killer moves, then by history score
+    def _order_moves(self, moves, hash_move, ply):
+        if len(moves) < 2:
+            return moves
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        history = self.history
+        is_capture_move = bitboard.Position.is_capture_move
+
+        def score(move):
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+            if is_capture_move(move):
+                return CAPTURE_SCORE
+            if move == killers[0]:
+                return KILLER_SCORES[0]
+            if move == killers[1]:
+                return KILLER_SCORES[1]
+            return history[move[0]][move[-1]]
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def _record_cutoff(self, move, index, depth, ply):
+        self.beta_cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if bitboard.Position.is_capture_move(move):
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[move[0]][move[-1]] += depth * depth
+
+    # Searches the position after the index-th move of a node. Plain
+    # alpha-beta gives every move the node's window; with pvs only the first
+    # move does, and the others are first searched with a null window that
+    # just tells whether they beat the best move so far, and searched again
+    # with the full window when they do.
+    def _search_child(self, position, depth, is_maximizing, alpha, beta, index, ply=1, static_eval=None):
+        child_maximizing = position.turn == bitboard.AI
+        if not self.pvs or index == 0:
+            return self._minimax(position, depth, child_maximizing, alpha, beta, ply, static_eval)
+        if is_maximizing:
+            score = self._minimax(position, depth, child_maximizing, alpha, alpha + NULL_WINDOW, ply, static_eval)
+        else:
+            score = self._minimax(position, depth, child_maximizing, beta - NULL_WINDOW, beta, ply, static_eval)
+        if alpha < score < beta:
+            score = self._minimax(position, depth, child_maximizing, alpha, beta, ply, static_eval)
+        return score
+
+    # Minimax with alpha-beta pruning on a single position that is updated
+    # with make_move/unmake_move. Each move is a whole turn, multi-jumps
+    # included, so maximizing and minimizing alternate with every ply. Results
+    # are cached by Zobrist key with the depth searched and whether the score
+    # is exact or only a bound from a cutoff.
+    def _minimax(self, position, depth, is_maximizing, alpha, beta, ply=1, static_eval=None):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            self._check_time()
+        if alpha < self.root_alpha:
+            alpha = self.root_alpha
+
+        key = position.hash
+        entry = self.transposition_table.probe(key)
+        self.tt_probes += 1
+        hash_move = None
+        if entry is not None:
+            self.tt_hits += 1
+            hash_move = entry[4]
+        if entry is not None and entry[1] >= depth:
+            _, _, bound, score, _, _ = entry
+            score = _score_from_table(score, ply)
+            if bound == EXACT:
+                return score
+            if bound == LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        if self.tablebases is not None and \
+           bitboard.popcount(position.ai | position.player) <= self.tablebases.max_pieces:
+            found = self.tablebases.probe(position)
+            if found is not None:
+                self.tb_hits += 1
+                return _tablebase_score(*found, ply)
 
-        if depth == 0 or board.is_game_over():
-            score = self._evaluate_board(board)
-            self.transposition_table[board_key] = score
+        if depth == 0 and self.quiescence:
+            return self._quiescence(position, is_maximizing, alpha, beta, ply, static_eval)
+
+        if depth == 0 or position.is_game_over():
+            score = static_eval if static_eval is not None else self._evaluate_board(position)
+            self.transposition_table.store(key, depth, EXACT, _score_to_table(score, ply), None)
             return score
 
+        alpha_start, beta_start = alpha, beta
+        best_move = None
+        moves = self._order_moves(position.get_all_valid_moves(bitboard.AI if is_maximizing else bitboard.PLAYER),
+                                  hash_move, ply)
+        static_evals = None
+        if depth == 1 and self.batch_eval and len(moves) > 1:
+            static_evals = self._evaluate_children(position, moves)
         if is_maximizing:
-            max_eval = float('-inf')
-            for move in board.get_all_valid_moves("AI"):
-                board_copy = self._copy_board(board)
-                board_copy.apply_move(move)
-                eval = self._minimax(board_copy, depth - 1, False, alpha, beta)
-                max_eval = max(max_eval, eval)
+            best_eval = float('-inf')
+            for index, move in enumerate(moves):
+                undo = position.make_move(move)
+                eval = self._search_child(position, depth - 1, True, alpha, beta, index, ply + 1,
+                                          static_evals[index] if static_evals else None)
+                position.unmake_move(undo)
+                if eval > best_eval:
+                    best_eval, best_move = eval, move
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self._record_cutoff(move, index, depth, ply)
                     break
-            self.transposition_table[board_key] = max_eval
-            return max_eval
         else:
-            min_eval = float('inf')
-            for move in board.get_all_valid_moves("Player"):
-                board_copy = self._copy_board(board)
-                board_copy.apply_move(move)
-                eval = self._minimax(board_copy, depth - 1, True, alpha, beta)
-                min_eval = min(min_eval, eval)
+            best_eval = float('inf')
+            for index, move in enumerate(moves):
+                undo = position.make_move(move)
+                eval = self._search_child(position, depth - 1, False, alpha, beta, index, ply + 1,
+                                          static_evals[index] if static_evals else None)
+                position.unmake_move(undo)
+                if eval < best_eval:
+                    best_eval, best_move = eval, move
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self._record_cutoff(move, index, depth, ply)
                     break  # Alpha-beta pruning
-            self.transposition_table[board_key] = min_eval
-            return min_eval
-
-    #Creates a copy of the board for minimax
-    def _copy_board(self, board):
-        new_board = type(board)(board.window, True)
-        new_board.boardArray = [
-            [self._copy_piece(piece) for piece in row]
-            for row in board.boardArray
-        ]
-        new_board.turn = board.turn
-        return new_board
-
-    def _copy_piece(self, piece):
-        if piece is None:
-            return None
-        new_piece = type(piece)(piece.row, piece.col, piece.player, piece.window, True)
-        new_piece.isKing = piece.isKing
-        return new_piece
-
-    # Converts board state to string representation for transposition table
-    def _board_to_key(self, board):
-        key = []
-        for row in board.boardArray:
-            for piece in row:
-                if piece is None:
-                    key.append('0')
-                else:
-                    key.append(f'{piece.player[0]}{"K" if piece.isKing else "P"}')
-        return ''.join(key)
+
+        if best_eval <= alpha_start:
+            bound = UPPER_BOUND
+        elif best_eval >= beta_start:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.transposition_table.store(key, depth, bound, _score_to_table(best_eval, ply), best_move)
+        return best_eval
+
+    # Quiescence search: at the horizon, keep searching while the side to
+    # move has captures so the evaluation is never taken in the middle of an
+    # exchange. Captures are forced, so there is no standing pat on the
+    # static evaluation while one is available; only quiet positions are
+    # evaluated.
+    def _quiescence(self, position, is_maximizing, alpha, beta, ply, static_eval=None):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            self._check_time()
+
+        captures = position.get_capture_moves(bitboard.AI if is_maximizing else bitboard.PLAYER)
+        if not captures or ply >= MAX_PLY:
+            return static_eval if static_eval is not None else self._evaluate_board(position)
+
+        best_eval = float('-inf') if is_maximizing else float('inf')
+        for index, move in enumerate(captures):
+            undo = position.make_move(move)
+            eval = self._quiescence(position, position.turn == bitboard.AI, alpha, beta, ply + 1)
+            position.unmake_move(undo)
+            if is_maximizing:
+                best_eval = max(best_eval, eval)
+                alpha = max(alpha, eval)
+            else:
+                best_eval = min(best_eval, eval)
+                beta = min(beta, eval)
+            if beta <= alpha:
+                self.beta_cutoffs += 1
+                if index == 0:
+                    self.first_move_cutoffs += 1
+                break
+        return best_eval
+
+
+def _tablebase_score(result, distance, ply):
+    # Wins score above any evaluation, sooner wins higher. The plies from the
+    # root count too, so a win found deeper in the tree with a shorter
+    # distance left does not outscore a faster one
+    if result == tablebase.AI_WIN:
+        return TABLEBASE_WIN_SCORE - (ply + distance)
+    if result == tablebase.PLAYER_WIN:
+        return ply + distance - TABLEBASE_WIN_SCORE
+    return 0
+
+
+def _score_to_table(score, ply):
+    if score > TABLEBASE_SCORE_FLOOR:
+        return score + ply
+    if score < -TABLEBASE_SCORE_FLOOR:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    if score > TABLEBASE_SCORE_FLOOR:
+        return score - ply
+    if score < -TABLEBASE_SCORE_FLOOR:
+        return score + ply
+    return score
+
+
+def _effective_branching_factor(nodes, depth):
+    if depth <= 0 or nodes <= 1:
+        return 0.0
+    low, high = 1.0, float(nodes)
+    for _ in range(50):
+        middle = (low + high) / 2
+        if sum(middle ** ply for ply in range(1, depth + 1)) < nodes:
+            low = middle
+        else:
+            high = middle
+    return round(low, 4)
@@ -0,0 +1,95 @@
+import argparse
+import collections
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import ai
+import bitboard
+
+# Batch analysis: reads FEN positions, one per line, from a file or stdin,
+# searches each for the side to move on a pool of worker processes, and
+# writes one JSON line per position, in input order, with the best move,
+# score, principal variation and node count. Only a few positions per worker
+# are in flight at a time, so memory stays flat however long the input is.
+#
+#   python analyze.py positions.txt --depth 6 > analysis.jsonl
+#   python analyze.py --time-ms 200 --workers 8 < positions.txt
+
+_worker_ai = None
+
+
+def _init_worker(options):
+    global _worker_ai
+    _worker_ai = ai.AI(None, **options)
+
+
+def analyze_position(task):
+    index, fen, seed = task
+    result = {"fen": fen}
+    try:
+        position = bitboard.Position.from_fen(fen)
+    except (ValueError, IndexError) as error:
+        result["error"] = f"bad FEN: {error}"
+        return result
+
+    # Each position is searched from a clean state and with noise seeded by
+    # its index, so its result does not depend on which positions the worker
+    # searched before it, and repeats between runs and worker counts
+    _worker_ai.reset()
+    random.seed(seed + index)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        analysis = _worker_ai.analyze(position)
+    result.update({"move": None if analysis["move"] is None else bitboard.move_text(analysis["move"]),
+                   "score": analysis["score"], "pv": [bitboard.move_text(move) for move in analysis["pv"]],
+                   "depth": analysis["depth"], "nodes": analysis["nodes"],
+                   "seconds": round(analysis["seconds"], 4)})
+    return result
+
+
+def _read_positions(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def run(lines, options, workers=None, seed=0):
+    """Yields the analysis of each FEN in lines, in order."""
+    workers = workers or os.cpu_count() or 1
+    with multiprocessing.Pool(workers, _init_worker, (options,)) as pool:
+        pending = collections.deque()
+        for index, fen in enumerate(_read_positions(lines)):
+            pending.append(pool.apply_async(analyze_position, ((index, fen, seed),)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze FEN positions with the AI")
+    parser.add_argument("input", nargs="?", help="file with one FEN per line (default: stdin)")
+    parser.add_argument("--depth", type=int, default=ai.LEVEL_DEPTHS["hard"])
+    parser.add_argument("--time-ms", type=int, help="search each position for this long instead of to --depth")
+    parser.add_argument("--tablebases", help="directory of endgame tablebases to probe")
+    parser.add_argument("--tt-path", help="persistent transposition table file shared by the workers")
+    parser.add_argument("--workers", type=int, help="processes to search in (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = {"depth": args.depth, "time_limit_ms": args.time_ms, "tablebases": args.tablebases,
+               "tt_path": args.tt_path}
+    lines = open(args.input) if args.input else sys.stdin
+    try:
+        for result in run(lines, options, args.workers, args.seed):
+            print(json.dumps(result), flush=True)
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+if __name__ == "__main__":
+    main()
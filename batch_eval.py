@@ -0,0 +1,119 @@
+import argparse
+import sys
+import numpy as np
+import ai
+import bitboard
+
+# Vectorized evaluation of many positions at once with NumPy. Positions are
+# given as three arrays of bitboards (AI pieces, Player pieces, kings) and get
+# the same score as AI._evaluate_board, without its random noise: material
+# and center control through piece-square tables, plus mobility.
+#
+# Offline scoring of a file of FEN positions, one per line:
+#
+#   python batch_eval.py positions.txt > scores.txt
+
+_SQUARE_SHIFTS = np.arange(bitboard.SQUARES, dtype=np.uint64)
+_CENTER = np.array([bitboard.CENTER_MASK >> square & 1 for square in range(bitboard.SQUARES)], dtype=np.float64)
+
+# Piece-square tables from each side's own point of view; a Player piece on
+# square s uses entry 31 - s, the same square seen from the other end
+def piece_tables(center_weight):
+    return bitboard.MAN_VALUE + center_weight * _CENTER, bitboard.KING_VALUE + center_weight * _CENTER
+
+
+MAN_TABLE, KING_TABLE = piece_tables(ai.CENTER_WEIGHT)
+
+
+def _unpack(bits):
+    # (N,) bitboards -> (N, 32) array of 0/1
+    return ((bits[:, None] >> _SQUARE_SHIFTS) & 1).astype(np.float64)
+
+
+def _popcount(bits):
+    bits = bits - ((bits >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    bits = (bits & np.uint64(0x3333333333333333)) + ((bits >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    bits = (bits + (bits >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((bits * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def _shift(bits, shift):
+    if shift > 0:
+        return (bits << np.uint64(shift)) & np.uint64(bitboard.ALL_SQUARES)
+    return bits >> np.uint64(-shift)
+
+
+def count_moves(own, opponent, kings, side):
+    """Vectorized Position.count_moves for arrays of bitboards."""
+    empty = ~(own | opponent) & np.uint64(bitboard.ALL_SQUARES)
+    steps = np.zeros(own.shape, dtype=np.int64)
+    jumps = np.zeros(own.shape, dtype=np.int64)
+    for directions, movers in ((bitboard.MAN_DIRECTIONS[side], own & ~kings),
+                               (bitboard.KING_DIRECTIONS, own & kings)):
+        for parts, jump_shift, jump_mask in directions:
+            jump_targets = _shift(empty, -jump_shift) & np.uint64(jump_mask)
+            for shift, mask in parts:
+                sources = movers & np.uint64(mask)
+                steps += _popcount(sources & _shift(empty, -shift))
+                jumps += _popcount(sources & jump_targets & _shift(opponent, -shift))
+    return np.where(jumps > 0, jumps, steps)
+
+
+def evaluate(ai_bits, player_bits, kings, man_table=MAN_TABLE, king_table=KING_TABLE,
+             mobility_weight=ai.MOBILITY_WEIGHT):
+    """Scores arrays of positions from the AI's point of view."""
+    ai_bits = np.asarray(ai_bits, dtype=np.uint64)
+    player_bits = np.asarray(player_bits, dtype=np.uint64)
+    kings = np.asarray(kings, dtype=np.uint64)
+
+    ai_kings = _unpack(ai_bits & kings)
+    ai_men = _unpack(ai_bits & ~kings)
+    player_kings = _unpack(player_bits & kings)[:, ::-1]
+    player_men = _unpack(player_bits & ~kings)[:, ::-1]
+
+    score = ai_men @ man_table + ai_kings @ king_table
+    score -= player_men @ man_table + player_kings @ king_table
+    mobility = count_moves(ai_bits, player_bits, kings, bitboard.AI) - \
+        count_moves(player_bits, ai_bits, kings, bitboard.PLAYER)
+    return score + mobility_weight * mobility
+
+
+def evaluate_positions(positions):
+    positions = list(positions)
+    return evaluate([position.ai for position in positions],
+                    [position.player for position in positions],
+                    [position.kings for position in positions])
+
+
+def _read_chunks(lines, size):
+    chunk = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score FEN positions with the batch evaluator")
+    parser.add_argument("input", nargs="?", help="file with one FEN per line (default: stdin)")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    lines = open(args.input) if args.input else sys.stdin
+    try:
+        for chunk in _read_chunks(lines, args.chunk_size):
+            scores = evaluate_positions(bitboard.Position.from_fen(fen) for fen in chunk)
+            for fen, score in zip(chunk, scores):
+                print(f"{score:.2f}\t{fen}")
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+if __name__ == "__main__":
+    main()
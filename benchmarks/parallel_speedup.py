@@ -0,0 +1,64 @@
+import argparse
+import contextlib
+import io
+import random
+import time
+import ai
+import bitboard
+
+# Measures how the parallel root search scales: the same position is searched
+# to the same depth in-process and with each worker count, each run with a
+# fresh AI so no transposition table is shared between runs.
+#
+#   python -m benchmarks.parallel_speedup --depth 6 --workers 1 2 4 8
+
+
+def benchmark_position(plies, seed):
+    # Midgame position reached by seeded random moves from the start, with
+    # the AI to move
+    rng = random.Random(seed)
+    position = bitboard.Position.initial()
+    while True:
+        moves = position.get_all_valid_moves()
+        if not moves or (plies <= 0 and position.turn == bitboard.AI):
+            return position
+        position.make_move(rng.choice(moves))
+        plies -= 1
+
+
+def run(position, depth, workers):
+    searcher = ai.AI(None, depth=depth, workers=workers)
+    if workers:
+        # Start the pool outside the timed region
+        searcher._parallel_search()
+    random.seed(0)
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            move = searcher.search(position.copy())
+        return time.perf_counter() - start, searcher.nodes, move
+    finally:
+        searcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel root search speedup")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--plies", type=int, default=10, help="random plies played before the measured position")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    position = benchmark_position(args.plies, args.seed)
+    print(f"Position: {position!r}, depth {args.depth}")
+
+    baseline, nodes, move = run(position, args.depth, None)
+    print(f"{'workers':>8} {'seconds':>9} {'nodes':>10} {'speedup':>8}  move")
+    print(f"{'serial':>8} {baseline:9.3f} {nodes:10d} {1.0:8.2f}  {move}")
+    for workers in args.workers:
+        seconds, nodes, move = run(position, args.depth, workers)
+        print(f"{workers:>8} {seconds:9.3f} {nodes:10d} {baseline / seconds:8.2f}  {move}")
+
+
+if __name__ == "__main__":
+    main()
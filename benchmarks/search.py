@@ -0,0 +1,101 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import random
+import sys
+import ai
+import bitboard
+
+# Search benchmark: runs AI.search over a fixed set of positions at each
+# difficulty and records the work done, so runs from different commits can be
+# compared and search-speed regressions caught.
+#
+#   python -m benchmarks.search --output run.json
+#   python -m benchmarks.search --format csv --levels hard
+#   python -m benchmarks.search --baseline run.json    # compare with an earlier run
+#   python -m benchmarks.search --tt-path bench.tt     # run twice to see a warm start
+#   python -m benchmarks.search --pvs --levels hard    # PVS against plain alpha-beta
+
+# name: FEN, all with the AI to move
+POSITIONS = {
+    "opening": "B:W18,21,22,24,25,26,27,28,29,30,31,32:B1,2,3,4,5,6,7,8,9,10,11,12",
+    "early": "B:W13,15,21,23,25,26,27,28,29,30,32:B1,3,4,5,6,7,8,10,12,14,20",
+    "middle": "B:W13,18,21,22,23,24,26,28,29,30:B1,2,3,4,6,9,12,14,15,16,20",
+    "king": "B:W11,13,19,21,23,24,27,29:B1,4,5,6,7,8,15,18,20,K22",
+    "late": "B:WK3,5,7,10,13,15,24,29,31:B1,11,12,14,22",
+}
+
+FIELDS = ("position", "level", "move", "depth", "nodes", "tt_probes", "tt_hits", "beta_cutoffs",
+          "first_move_cutoffs", "first_move_cutoff_rate", "tb_hits", "branching_factor", "seconds", "nps")
+
+
+def run(levels, time_limit_ms=None, seed=0, tt_path=None, pvs=False):
+    for name, fen in POSITIONS.items():
+        for level in levels:
+            searcher = ai.AI(None, level=level, time_limit_ms=time_limit_ms, tt_path=tt_path, pvs=pvs)
+            # The evaluation adds random noise; seed it so runs repeat
+            random.seed(seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                move = searcher.search(bitboard.Position.from_fen(fen))
+            result = {"position": name, "level": level,
+                      "move": None if move is None else bitboard.move_text(move)}
+            result.update(searcher.search_stats())
+            searcher.close()
+            yield result
+
+
+def compare(results, baseline):
+    # Ratios above 1 mean this run did more nodes or took longer
+    previous = {(row["position"], row["level"]): row for row in baseline}
+    for row in results:
+        old = previous.get((row["position"], row["level"]))
+        if old is None:
+            continue
+        nodes = row["nodes"] / old["nodes"] if old["nodes"] else float("nan")
+        seconds = row["seconds"] / old["seconds"] if old["seconds"] else float("nan")
+        print(f"{row['position']:>8} {row['level']:>7}  nodes x{nodes:.2f}  time x{seconds:.2f}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search benchmark")
+    parser.add_argument("--levels", nargs="+", default=list(ai.LEVEL_DEPTHS))
+    parser.add_argument("--time-ms", type=int, help="search each position for this long instead of to a fixed depth")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--output", help="file to write the results to (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tt-path", help="persistent transposition table file to search with")
+    parser.add_argument("--pvs", action="store_true",
+                        help="search with PVS and aspiration windows and compare with plain alpha-beta")
+    args = parser.parse_args()
+    if args.pvs and args.tt_path:
+        # The first run would leave the table warm for the second
+        parser.error("--pvs compares two cold searches and cannot be used with --tt-path")
+
+    results = list(run(args.levels, args.time_ms, args.seed, args.tt_path, args.pvs))
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(results, out, indent=2)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(results, json.load(baseline_file))
+    if args.pvs:
+        print("PVS against plain alpha-beta:", file=sys.stderr)
+        compare(results, list(run(args.levels, args.time_ms, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+import random
+import consts
+import pieces
+
+# Compact position used by the AI search.
+#
+# Only the 32 dark squares can hold a piece, so a side fits in a 32-bit
+# integer. Squares are numbered 0-31, four per row, from the top-left of the
+# board: square s sits on row s // 4, on the odd columns of even rows and the
+# even columns of odd rows. The AI starts on rows 0-2 and moves down, the
+# Player starts on rows 5-7 and moves up.
+
+AI = "AI"
+PLAYER = "Player"
+
+SQUARES = 32
+ALL_SQUARES = (1 << SQUARES) - 1
+
+
+def square_of(row, col):
+    return row * 4 + col // 2
+
+
+def coords_of(square):
+    row = square // 4
+    return row, (square % 4) * 2 + (1 if row % 2 == 0 else 0)
+
+
+def other(side):
+    return PLAYER if side == AI else AI
+
+
+def _mask(predicate):
+    mask = 0
+    for square in range(SQUARES):
+        if predicate(*coords_of(square)):
+            mask |= 1 << square
+    return mask
+
+
+ROW_MASKS = [_mask(lambda row, col, r=r: row == r) for r in range(consts.BOARD_SIZE)]
+CENTER_MASK = _mask(lambda row, col: 2 <= row <= 5 and 2 <= col <= 5)
+AI_START = _mask(lambda row, col: row < 3)
+PLAYER_START = _mask(lambda row, col: row >= consts.BOARD_SIZE - 3)
+# Rows on which a man of each side is promoted
+KING_ROWS = {AI: ROW_MASKS[consts.BOARD_SIZE - 1], PLAYER: ROW_MASKS[0]}
+
+
+def _build_direction(dr, dc):
+    # A single step changes the square index by a different amount on even
+    # and odd rows, so a step is stored as (shift, source mask) parts. A jump
+    # always moves two rows and two columns, which is one fixed shift.
+    parts = {}
+    jump_shift = 0
+    jump_mask = 0
+    for square in range(SQUARES):
+        row, col = coords_of(square)
+        if 0 <= row + dr < consts.BOARD_SIZE and 0 <= col + dc < consts.BOARD_SIZE:
+            shift = square_of(row + dr, col + dc) - square
+            parts[shift] = parts.get(shift, 0) | 1 << square
+        if 0 <= row + 2 * dr < consts.BOARD_SIZE and 0 <= col + 2 * dc < consts.BOARD_SIZE:
+            jump_shift = square_of(row + 2 * dr, col + 2 * dc) - square
+            jump_mask |= 1 << square
+    return tuple(parts.items()), jump_shift, jump_mask
+
+
+DOWN = (_build_direction(1, -1), _build_direction(1, 1))
+UP = (_build_direction(-1, -1), _build_direction(-1, 1))
+MAN_DIRECTIONS = {AI: DOWN, PLAYER: UP}
+KING_DIRECTIONS = DOWN + UP
+
+
+# Version of the move rules above. Files computed from them, such as the
+# opening book, record it and are refused once the rules change.
+RULES_VERSION = 2
+
+
+# Zobrist keys, ZOBRIST[side][is_king][square], plus one key toggled when the
+# AI is to move. The seed is fixed so hashes are stable between runs.
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST = {side: [[_zobrist_random.getrandbits(64) for _ in range(SQUARES)] for _ in range(2)]
+           for side in (AI, PLAYER)}
+ZOBRIST_AI_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+def _shift(bits, shift):
+    return (bits << shift) & ALL_SQUARES if shift > 0 else bits >> -shift
+
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(bits):
+        return bin(bits).count("1")
+
+
+def iter_squares(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _mirror_bits(bits):
+    mirrored = 0
+    for square in iter_squares(bits):
+        mirrored |= 1 << (SQUARES - 1 - square)
+    return mirrored
+
+
+# Evaluation terms kept up to date by make_move: material counts a man as 1
+# and a king as 3, center counts pieces on CENTER_MASK, both as AI minus
+# Player
+MAN_VALUE = 1
+KING_VALUE = 3
+
+
+class Position:
+    __slots__ = ("ai", "player", "kings", "turn", "hash", "material", "center")
+
+    def __init__(self, ai=0, player=0, kings=0, turn=PLAYER):
+        self.ai = ai
+        self.player = player
+        self.kings = kings
+        self.turn = turn
+        self.hash = self.compute_hash()
+        self.material, self.center = self.compute_totals()
+
+    @classmethod
+    def initial(cls):
+        return cls(AI_START, PLAYER_START, 0, PLAYER)
+
+    @classmethod
+    def from_board(cls, board):
+        ai = player = kings = 0
+        for row in range(consts.BOARD_SIZE):
+            for col in range(consts.BOARD_SIZE):
+                piece = board.boardArray[row][col]
+                if piece is None:
+                    continue
+                bit = 1 << square_of(row, col)
+                if piece & pieces.AI:
+                    ai |= bit
+                else:
+                    player |= bit
+                if piece & pieces.KING:
+                    kings |= bit
+        return cls(ai, player, kings, board.turn)
+
+    def to_board(self, board):
+        """Writes this position into a Board's boardArray and turn."""
+        board.boardArray = [[None for _ in range(consts.BOARD_SIZE)] for _ in range(consts.BOARD_SIZE)]
+        for side, bits in ((AI, self.ai), (PLAYER, self.player)):
+            for square in iter_squares(bits):
+                row, col = coords_of(square)
+                board.boardArray[row][col] = pieces.piece(side, self.kings >> square & 1)
+        board.turn = self.turn
+        return board
+
+    def copy(self):
+        return Position(self.ai, self.player, self.kings, self.turn)
+
+    def mirrored(self):
+        """The same position with the board turned half a turn and the sides
+        swapped, so that a search for the AI finds the Player's moves. Square
+        s becomes square 31 - s."""
+        return Position(_mirror_bits(self.player), _mirror_bits(self.ai), _mirror_bits(self.kings),
+                        other(self.turn))
+
+    @staticmethod
+    def mirror_move(move):
+        return tuple(SQUARES - 1 - square for square in move)
+
+    # FEN strings in the PDN style, e.g. "W:W21,22,K30:B1,2,K9". Squares are
+    # numbered 1-32 as in PDN; Black is the AI (squares 1-12 at the start)
+    # and White is the Player.
+
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.strip().rstrip(".").split(":")
+        turn_field = fields[0].strip().upper()
+        if turn_field not in ("W", "B"):
+            raise ValueError(f"Invalid FEN side to move: {fen!r}")
+        masks = {"W": [0, 0], "B": [0, 0]}
+        for field in fields[1:]:
+            field = field.strip()
+            color = field[:1].upper()
+            if color not in masks:
+                raise ValueError(f"Invalid FEN field {field!r} in {fen!r}")
+            for token in filter(None, (token.strip() for token in field[1:].split(","))):
+                king = token[0].upper() == "K"
+                number = int(token[1:] if king else token)
+                if not 1 <= number <= SQUARES:
+                    raise ValueError(f"Invalid FEN square {token!r} in {fen!r}")
+                bit = 1 << (number - 1)
+                if (masks["W"][0] | masks["B"][0]) & bit:
+                    raise ValueError(f"Invalid FEN, square {number} is given twice: {fen!r}")
+                masks[color][0] |= bit
+                if king:
+                    masks[color][1] |= bit
+        player, player_kings = masks["W"]
+        ai, ai_kings = masks["B"]
+        if ai & ~ai_kings & KING_ROWS[AI] or player & ~player_kings & KING_ROWS[PLAYER]:
+            raise ValueError(f"Invalid FEN, a man stands on its promotion row: {fen!r}")
+        return cls(ai, player, ai_kings | player_kings, PLAYER if turn_field == "W" else AI)
+
+    def to_fen(self):
+        fields = ["W" if self.turn == PLAYER else "B"]
+        for color, bits in (("W", self.player), ("B", self.ai)):
+            squares = [("K" if self.kings >> square & 1 else "") + str(square + 1)
+                       for square in iter_squares(bits)]
+            fields.append(color + ",".join(squares))
+        return ":".join(fields)
+
+    # Compact picklable form for sending positions to worker processes
+    def pack(self):
+        return (self.ai, self.player, self.kings, self.turn)
+
+    @classmethod
+    def unpack(cls, packed):
+        return cls(*packed)
+
+    def compute_hash(self):
+        """Zobrist key computed from scratch; make_move keeps self.hash in
+        step incrementally."""
+        key = ZOBRIST_AI_TO_MOVE if self.turn == AI else 0
+        for side, bits in ((AI, self.ai), (PLAYER, self.player)):
+            men, kings = ZOBRIST[side]
+            for square in iter_squares(bits):
+                key ^= kings[square] if self.kings >> square & 1 else men[square]
+        return key
+
+    def compute_totals(self):
+        material = MAN_VALUE * (popcount(self.ai) - popcount(self.player)) + \
+            (KING_VALUE - MAN_VALUE) * (popcount(self.ai & self.kings) - popcount(self.player & self.kings))
+        center = popcount(self.ai & CENTER_MASK) - popcount(self.player & CENTER_MASK)
+        return material, center
+
+    def __eq__(self, other_position):
+        return isinstance(other_position, Position) and \
+            (self.ai, self.player, self.kings, self.turn) == \
+            (other_position.ai, other_position.player, other_position.kings, other_position.turn)
+
+    def __hash__(self):
+        return self.hash
+
+    def __repr__(self):
+        return f"Position(ai={self.ai:#010x}, player={self.player:#010x}, kings={self.kings:#010x}, turn={self.turn!r})"
+
+    def pieces_of(self, side):
+        return self.ai if side == AI else self.player
+
+    def empty(self):
+        return ~(self.ai | self.player) & ALL_SQUARES
+
+    # Move generation
+    #
+    # A move is a tuple of the squares the piece stops on, from its start to
+    # its end: (from_square, to_square) for a single step or jump, and one
+    # more square for each further jump of a multi-jump. Captures are forced:
+    # when a side can jump, its moves are only its complete jump sequences.
+    # A sequence goes on as long as the piece can jump again, except that a
+    # man reaching the king row is crowned and the move ends. These are the
+    # same moves Board.get_all_valid_moves produces.
+
+    def get_all_valid_moves(self, side=None):
+        side = self.turn if side is None else side
+        moves = self.get_capture_moves(side)
+        if moves:
+            return moves
+        own = self.pieces_of(side)
+        empty = self.empty()
+        moves = []
+        for directions, movers in ((MAN_DIRECTIONS[side], own & ~self.kings),
+                                   (KING_DIRECTIONS, own & self.kings)):
+            if not movers:
+                continue
+            for parts, _, _ in directions:
+                for shift, mask in parts:
+                    for square in iter_squares(movers & mask & _shift(empty, -shift)):
+                        moves.append((square, square + shift))
+        return moves
+
+    def get_capture_moves(self, side=None):
+        """The complete jump sequences of side, whether or not it has to
+        capture."""
+        side = self.turn if side is None else side
+        opponent = self.pieces_of(other(side))
+        moves = []
+        for square in iter_squares(self.capture_squares(side)):
+            is_king = bool(self.kings >> square & 1)
+            # As in Board.move_piece, the jumping piece leaves its start empty
+            # and each jumped piece is removed at once
+            self._add_jumps(side, is_king, (square,), opponent, self.empty() | 1 << square, moves)
+        return moves
+
+    def _add_jumps(self, side, is_king, path, opponent, empty, moves):
+        square = path[-1]
+        bit = 1 << square
+        extended = False
+        for _, jump_shift, jump_mask in (KING_DIRECTIONS if is_king else MAN_DIRECTIONS[side]):
+            if not bit & jump_mask:
+                continue
+            landing = square + jump_shift
+            jumped = JUMPED_SQUARES[square, landing]
+            if not (empty >> landing & 1 and opponent >> jumped & 1):
+                continue
+            extended = True
+            if not is_king and KING_ROWS[side] >> landing & 1:
+                moves.append(path + (landing,))
+            else:
+                self._add_jumps(side, is_king, path + (landing,), opponent & ~(1 << jumped),
+                                (empty | 1 << jumped) & ~(1 << landing) | bit, moves)
+        if not extended and len(path) > 1:
+            moves.append(path)
+
+    def capture_squares(self, side):
+        """Bitmask of the pieces of side that have a jump available."""
+        own = self.pieces_of(side)
+        opponent = self.pieces_of(other(side))
+        empty = self.empty()
+        jumpers = 0
+        for directions, movers in ((MAN_DIRECTIONS[side], own & ~self.kings),
+                                   (KING_DIRECTIONS, own & self.kings)):
+            if not movers:
+                continue
+            for parts, jump_shift, jump_mask in directions:
+                for shift, mask in parts:
+                    jumpers |= movers & mask & jump_mask & _shift(opponent, -shift) & _shift(empty, -jump_shift)
+        return jumpers
+
+    def count_moves(self, side):
+        """The number of moves of side counted with popcounts, without
+        building the move list: its first jumps if it has any (a multi-jump
+        counts once per way it can start), else its steps."""
+        own = self.pieces_of(side)
+        opponent = self.pieces_of(other(side))
+        empty = self.empty()
+        steps = jumps = 0
+        for directions, movers in ((MAN_DIRECTIONS[side], own & ~self.kings),
+                                   (KING_DIRECTIONS, own & self.kings)):
+            if not movers:
+                continue
+            for parts, jump_shift, jump_mask in directions:
+                for shift, mask in parts:
+                    sources = movers & mask
+                    steps += popcount(sources & _shift(empty, -shift))
+                    jumps += popcount(sources & jump_mask & _shift(opponent, -shift) & _shift(empty, -jump_shift))
+        return jumps or steps
+
+    def has_moves(self, side):
+        own = self.pieces_of(side)
+        opponent = self.pieces_of(other(side))
+        empty = self.empty()
+        for directions, movers in ((MAN_DIRECTIONS[side], own & ~self.kings),
+                                   (KING_DIRECTIONS, own & self.kings)):
+            if not movers:
+                continue
+            for parts, jump_shift, jump_mask in directions:
+                for shift, mask in parts:
+                    sources = movers & mask
+                    if sources & _shift(empty, -shift) or \
+                       sources & jump_mask & _shift(opponent, -shift) & _shift(empty, -jump_shift):
+                        return True
+        return False
+
+    def is_game_over(self):
+        return not self.has_moves(AI) or not self.has_moves(PLAYER)
+
+    @staticmethod
+    def is_capture_move(move):
+        start, end = move[0], move[-1]
+        return len(move) > 2 or end - start > 5 or start - end > 5
+
+    def is_kinging_move(self, move):
+        start, end = move[0], move[-1]
+        if self.kings >> start & 1:
+            return False
+        side = AI if self.ai >> start & 1 else PLAYER
+        return bool(KING_ROWS[side] >> end & 1)
+
+    def make_move(self, move):
+        """Applies move in place, following Board.move_piece, and returns the
+        undo record that unmake_move needs to restore the position exactly.
+        The turn always passes to the other side."""
+        start, end = move[0], move[-1]
+        start_bit, end_bit = 1 << start, 1 << end
+        # Zero when a king's multi-jump ends where it started
+        move_bits = start_bit ^ end_bit
+        previous = (self.turn, self.hash, self.material, self.center)
+        if self.ai & start_bit:
+            side, opponent, sign = AI, PLAYER, 1
+            self.ai ^= move_bits
+        else:
+            side, opponent, sign = PLAYER, AI, -1
+            self.player ^= move_bits
+        was_king = self.kings & start_bit
+        if was_king:
+            self.kings ^= move_bits
+        keys = ZOBRIST[side][1 if was_king else 0]
+        self.hash ^= keys[start] ^ keys[end]
+        if CENTER_MASK & move_bits:
+            self.center += sign * ((CENTER_MASK >> end & 1) - (CENTER_MASK >> start & 1))
+
+        captured = captured_king = 0
+        if self.is_capture_move(move):
+            opponent_keys = ZOBRIST[opponent]
+            for index in range(len(move) - 1):
+                jumped = JUMPED_SQUARES[move[index], move[index + 1]]
+                jumped_bit = 1 << jumped
+                is_king = self.kings & jumped_bit
+                captured |= jumped_bit
+                captured_king |= is_king
+                self.hash ^= opponent_keys[1 if is_king else 0][jumped]
+                self.material += sign * (KING_VALUE if is_king else MAN_VALUE)
+            self.kings ^= captured_king
+            if side == AI:
+                self.player ^= captured
+            else:
+                self.ai ^= captured
+            self.center += sign * popcount(CENTER_MASK & captured)
+
+        promoted = 0
+        if not was_king and KING_ROWS[side] & end_bit:
+            promoted = end_bit
+            self.kings |= end_bit
+            self.hash ^= ZOBRIST[side][0][end] ^ ZOBRIST[side][1][end]
+            self.material += sign * (KING_VALUE - MAN_VALUE)
+        self._set_turn(opponent)
+        return (move, side, captured, captured_king, promoted, previous)
+
+    def _set_turn(self, side):
+        if side != self.turn:
+            self.turn = side
+            self.hash ^= ZOBRIST_AI_TO_MOVE
+
+    def unmake_move(self, undo):
+        move, side, captured, captured_king, promoted, previous = undo
+        move_bits = 1 << move[0] ^ 1 << move[-1]
+        end = move[-1]
+        self.kings ^= promoted
+        if self.kings & 1 << end:
+            self.kings ^= move_bits
+        if side == AI:
+            self.ai ^= move_bits
+            self.player |= captured
+        else:
+            self.player ^= move_bits
+            self.ai |= captured
+        self.kings |= captured_king
+        self.turn, self.hash, self.material, self.center = previous
+
+    def play(self, move):
+        """Returns a new position with move applied."""
+        child = self.copy()
+        child.make_move(move)
+        return child
+
+    # Conversion between square moves and Board moves, which are the same
+    # tuples with a (row, col) for each square
+
+    @staticmethod
+    def to_board_move(move):
+        return tuple(coords_of(square) for square in move)
+
+    @staticmethod
+    def from_board_move(move):
+        return tuple(square_of(*coords) for coords in move)
+
+
+# A move packed into a 64-bit int, as the opening book and the persistent
+# transposition table store it: the square count in the low four bits and
+# five bits per square above them. Longer moves do not fit.
+MAX_PACKED_SQUARES = 12
+
+
+def pack_move(move):
+    """Packs move into an int; None, or a move too long to pack, gives 0."""
+    if move is None or len(move) > MAX_PACKED_SQUARES:
+        return 0
+    packed = len(move)
+    for index, square in enumerate(move):
+        packed |= square << (4 + 5 * index)
+    return packed
+
+
+def unpack_move(packed):
+    if not packed & 0xF:
+        return None
+    return tuple(packed >> (4 + 5 * index) & 0x1F for index in range(packed & 0xF))
+
+
+def move_text(move):
+    """A square move in PDN notation: "22-18" for a step, "22x15x8" for
+    jumps."""
+    separator = "x" if Position.is_capture_move(move) else "-"
+    return separator.join(str(square + 1) for square in move)
+
+
+def _jumped_squares():
+    jumped = {}
+    for start in range(SQUARES):
+        start_row, start_col = coords_of(start)
+        for dr in (-2, 2):
+            for dc in (-2, 2):
+                end_row, end_col = start_row + dr, start_col + dc
+                if 0 <= end_row < consts.BOARD_SIZE and 0 <= end_col < consts.BOARD_SIZE:
+                    end = square_of(end_row, end_col)
+                    jumped[start, end] = square_of(start_row + dr // 2, start_col + dc // 2)
+    return jumped
+
+
+# Square jumped over by each (start, end) capture
+JUMPED_SQUARES = _jumped_squares()
@@ -1,84 +1,40 @@
-import pygame
 import pieces
 import consts
 
+# Rules and state of a checkers game. Nothing here imports pygame, so the
+# board can be used headless by the AI, workers and tools; renderer.py draws
+# it in the game window.
+#
+# Captures are forced, and a piece that has jumped must keep jumping while it
+# can; the turn only passes once its move is complete. move_piece plays one
+# step or jump at a time, as the Player clicks them, and get_all_valid_moves
+# lists whole moves as tuples of the squares the piece stops on.
 class Board:
-    def __init__(self, window, sim = False):
-        self.window = window
+    def __init__(self):
         self.boardArray = [[None for _ in range(consts.BOARD_SIZE)] for _ in range(consts.BOARD_SIZE)]
         self.turn = "Player"
-        self.sim = sim
-        self.initialize_board_background()
-        self.draw_board()
+        # (row, col) of the piece in the middle of a multi-jump, which has to
+        # jump on before the turn passes
+        self.jumping = None
+        # Called as on_move(side, (prevPos, newPos)) after each move, e.g.
+        # to record the game
+        self.on_move = None
         self.initialize_board()
 
-    def initialize_board_background(self):
-        if self.sim == False:
-            self.board_background_image = pygame.image.load("assets/board_background.png").convert_alpha()
-            self.board_background_image.set_alpha(100)
-            self.board_background_image = pygame.transform.scale(
-                self.board_background_image,
-                (consts.BOARD_SIZE * consts.SQUARE_SIZE, consts.BOARD_SIZE * consts.SQUARE_SIZE)
-            )
-        
-    def draw_board(self):
-        if self.sim == True:
-            return
-
-        board_shadow_surface = pygame.Surface((consts.BOARD_SIZE * consts.SQUARE_SIZE + 20,
-                                               consts.BOARD_SIZE * consts.SQUARE_SIZE + 20))
-        board_shadow_surface.set_colorkey((0, 0, 0))
-        board_shadow_surface.set_alpha(50)
-        
-        # Draw Board Shadow
-        pygame.draw.rect(board_shadow_surface, (30, 30, 30), 
-                         pygame.Rect(0, 0,
-                             consts.BOARD_SIZE * consts.SQUARE_SIZE + 20, 
-                             consts.BOARD_SIZE * consts.SQUARE_SIZE + 20))
-        self.window.blit(board_shadow_surface, 
-                         (consts.X_CENTER_OFFSET - 5, consts.Y_CENTER_OFFSET - 5))
-        self.window.blit(board_shadow_surface, 
-                         (consts.X_CENTER_OFFSET, consts.Y_CENTER_OFFSET))
-        self.window.blit(board_shadow_surface, 
-                         (consts.X_CENTER_OFFSET - 2.5, consts.Y_CENTER_OFFSET - 2.5))
-        self.window.blit(board_shadow_surface, 
-                         (consts.X_CENTER_OFFSET - 7.5, consts.Y_CENTER_OFFSET - 7.5))
-
-        # Board Outline
-        pygame.draw.rect(self.window, (139,69,19),
-                         (consts.X_CENTER_OFFSET - 10, consts.Y_CENTER_OFFSET - 10,
-                          consts.SQUARE_SIZE * 8 + 20, consts.SQUARE_SIZE * 8 + 20))
-        for row in range(consts.BOARD_SIZE):
-            for col in range(consts.BOARD_SIZE):
-                color = pygame.Color(215, 165, 97) if (row + col) % 2 == 0 else pygame.Color(165, 102, 37)
-                pygame.draw.rect(self.window, color,
-                                 (col * consts.SQUARE_SIZE + consts.X_CENTER_OFFSET,
-                                  row * consts.SQUARE_SIZE + consts.Y_CENTER_OFFSET,
-                                  consts.SQUARE_SIZE, consts.SQUARE_SIZE))
-        self.window.blit(self.board_background_image, (consts.X_CENTER_OFFSET, consts.Y_CENTER_OFFSET))
-        
     def initialize_board(self):
         for row in range(consts.BOARD_SIZE):
             for col in range(consts.BOARD_SIZE):
                 if row < 3 and (row + col) % 2 == 1:
-                    self.boardArray[row][col] = pieces.piece(row, col, "AI", self.window, self.sim)
+                    self.boardArray[row][col] = pieces.AI_MAN
                 elif row >= consts.BOARD_SIZE - 3 and (row + col) % 2 == 1:
-                    self.boardArray[row][col] = pieces.piece(row, col, "Player", self.window, self.sim)
-
-    def draw_pieces(self):
-        if self.sim == True:
-            return
-        for row in range(consts.BOARD_SIZE):
-            for col in range(consts.BOARD_SIZE):
-                if self.boardArray[row][col] is not None:
-                    self.boardArray[row][col].draw_piece()
+                    self.boardArray[row][col] = pieces.PLAYER_MAN
 
     def move_piece(self, prevPos, newPos):
         prevRow, prevCol = prevPos
         newRow, newCol = newPos
         selected_piece = self.boardArray[prevRow][prevCol]
 
-        if selected_piece is None or selected_piece.player != self.turn:
+        if selected_piece is None or selected_piece & pieces.SIDE != pieces.SIDE_CODES[self.turn]:
             print("Invalid move.")
             return
 
@@ -88,29 +44,29 @@ class Board:
 
         self.boardArray[newRow][newCol] = selected_piece
         self.boardArray[prevRow][prevCol] = None
-        selected_piece.row, selected_piece.col = newRow, newCol
+        player = pieces.player(selected_piece)
 
         if abs(newRow - prevRow) == 2:  # Capture move
             midRow, midCol = (prevRow + newRow) // 2, (prevCol + newCol) // 2
             self.boardArray[midRow][midCol] = None
 
             # Check for additional capture moves
-            if self.has_capture_moves(selected_piece):
+            if self.has_capture_moves(newPos):
                 print("Multiple captures available! Continue with the same piece.")
-                self.draw_board()
-                self.draw_pieces()
+                self.jumping = newPos
+                if self.on_move is not None:
+                    self.on_move(player, (prevPos, newPos))
                 return
 
-        if not selected_piece.isKing and \
-           ((selected_piece.player == "AI" and newRow == consts.BOARD_SIZE - 1) or
-            (selected_piece.player == "Player" and newRow == 0)):
-            selected_piece.make_king()
-
-        self.draw_board()
-        self.draw_pieces()
+        if selected_piece == pieces.AI_MAN and newRow == consts.BOARD_SIZE - 1 or \
+           selected_piece == pieces.PLAYER_MAN and newRow == 0:
+            self.boardArray[newRow][newCol] = pieces.make_king(selected_piece)
 
         # Switch turns
+        self.jumping = None
         self.turn = "Player" if self.turn == "AI" else "AI"
+        if self.on_move is not None:
+            self.on_move(player, (prevPos, newPos))
 
     def check_winner(self): 
         player1_pieces = []
@@ -120,10 +76,10 @@ class Board:
             for col in range(consts.BOARD_SIZE):
                 piece = self.boardArray[row][col]
                 if piece:
-                    if piece.player == "AI":
-                        player1_pieces.append(piece)
-                    elif piece.player == "Player":
-                        player2_pieces.append(piece)
+                    if piece & pieces.AI:
+                        player1_pieces.append((row, col))
+                    else:
+                        player2_pieces.append((row, col))
 
         if not player1_pieces:
             return "Player"
@@ -137,16 +93,28 @@ class Board:
         if not any (self.has_valid_moves(p) for p in player2_pieces):
             return "AI"
         
-    def has_valid_moves(self, piece):
-        """Checks if a given piece has any valid moves."""
+    def has_valid_moves(self, pos):
+        """Checks if the piece at pos has any valid moves."""
+        row, col = pos
         directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]  # All possible directions
         for dr, dc in directions:
-            newRow, newCol = piece.row + dr, piece.col + dc
-            if self.is_valid_move((piece.row, piece.col), (newRow, newCol)):
+            if self._can_move(pos, (row + dr, col + dc)):
                 return True
-        return self.has_capture_moves(piece)
+        return self.has_capture_moves(pos)
 
     def is_valid_move(self, prevPos, newPos):
+        """Checks if the piece at prevPos may step or jump to newPos now,
+        taking forced captures and an unfinished multi-jump into account."""
+        if not self._can_move(prevPos, newPos):
+            return False
+        is_jump = abs(newPos[0] - prevPos[0]) == 2
+        player = pieces.player(self.boardArray[prevPos[0]][prevPos[1]])
+        if self.jumping is not None and player == self.turn:
+            return is_jump and prevPos == self.jumping
+        return is_jump or not self.must_capture(player)
+
+    def _can_move(self, prevPos, newPos):
+        # Whether the piece can step or jump there at all
         prevRow, prevCol = prevPos
         newRow, newCol = newPos
 
@@ -162,140 +130,178 @@ class Board:
         rowDiff = newRow - prevRow
         colDiff = abs(newCol - prevCol)
         if abs(rowDiff) == 1 and colDiff == 1:
-            return selected_piece.isKing or \
-                   (selected_piece.player == "AI" and rowDiff == 1) or \
-                   (selected_piece.player == "Player" and rowDiff == -1)
+            return selected_piece & pieces.KING != 0 or \
+                   (selected_piece == pieces.AI_MAN and rowDiff == 1) or \
+                   (selected_piece == pieces.PLAYER_MAN and rowDiff == -1)
         
         if abs(rowDiff) == 2 and colDiff == 2:
             midRow, midCol = (prevRow + newRow) // 2, (prevCol + newCol) // 2
             mid_piece = self.boardArray[midRow][midCol]
             valid_direction = (
-                selected_piece.isKing or
-                (selected_piece.player == "AI" and rowDiff == 2) or
-                (selected_piece.player == "Player" and rowDiff == -2)
+                selected_piece & pieces.KING != 0 or
+                (selected_piece == pieces.AI_MAN and rowDiff == 2) or
+                (selected_piece == pieces.PLAYER_MAN and rowDiff == -2)
             )
             return (
                 mid_piece is not None and 
-                mid_piece.player != selected_piece.player and
+                mid_piece & pieces.SIDE != selected_piece & pieces.SIDE and
                 self.boardArray[newRow][newCol] is None and
                 valid_direction
             )
 
         return False
 
-    def has_capture_moves(self, piece):
-        if piece.isKing:
+    def has_capture_moves(self, pos):
+        row, col = pos
+        piece = self.boardArray[row][col]
+        if piece & pieces.KING:
             directions = [(2, 2), (2, -2), (-2, 2), (-2, -2)]
         else:
-            directions = [(2, 2), (2, -2)] if piece.player == "AI" else [(-2, 2), (-2, -2)]
+            directions = [(2, 2), (2, -2)] if piece == pieces.AI_MAN else [(-2, 2), (-2, -2)]
     
         for dr, dc in directions:
-            newRow, newCol = piece.row + dr, piece.col + dc
+            newRow, newCol = row + dr, col + dc
             if 0 <= newRow < consts.BOARD_SIZE and 0 <= newCol < consts.BOARD_SIZE:
-                midRow, midCol = (piece.row + newRow) // 2, (piece.col + newCol) // 2
+                midRow, midCol = (row + newRow) // 2, (col + newCol) // 2
                 mid_piece = self.boardArray[midRow][midCol]
                 if (
                     self.boardArray[newRow][newCol] is None and
                     mid_piece is not None and
-                    mid_piece.player != piece.player
+                    mid_piece & pieces.SIDE != piece & pieces.SIDE
                 ):                    
                     return True
         return False
 
+    def must_capture(self, player):
+        side = pieces.SIDE_CODES[player]
+        for row in range(consts.BOARD_SIZE):
+            for col in range(consts.BOARD_SIZE):
+                piece = self.boardArray[row][col]
+                if piece and piece & side and self.has_capture_moves((row, col)):
+                    return True
+        return False
+
     def is_game_over(self):
         player1_moves = self.get_all_valid_moves("AI")
         player2_moves = self.get_all_valid_moves("Player")
         return len(player1_moves) == 0 or len(player2_moves) == 0
 
     def get_all_valid_moves(self, player):
-        moves = []
-        # capture_moves = []
+        """Whole moves of player: a step as (start, end), or a complete jump
+        sequence as (start, landing, landing...), only jumps if it can
+        capture."""
+        side = pieces.SIDE_CODES[player]
+        if self.jumping is not None and player == self.turn:
+            starts = [self.jumping]
+        else:
+            starts = [(row, col) for row in range(consts.BOARD_SIZE) for col in range(consts.BOARD_SIZE)
+                      if self.boardArray[row][col] and self.boardArray[row][col] & side]
 
-        for row in range(consts.BOARD_SIZE):
-            for col in range(consts.BOARD_SIZE):
+        capture_moves = []
+        for row, col in starts:
+            if self.has_capture_moves((row, col)):
+                # Lift the piece so it can jump across its start square
                 piece = self.boardArray[row][col]
-                if piece and piece.player == player:
-                    piece_moves = self.get_piece_moves(piece)
-                    for move in piece_moves:
-                        # if abs(move[0][0] - move[1][0]) == 2:  # Capture move check
-                        #     capture_moves.append(move)
-                        # else:
-                        moves.append(move)
-
-        # print(f"[DEBUG] Player {player} has {len(capture_moves)} capture moves and {len(moves)} regular moves.")
-        # return capture_moves if capture_moves else moves
-        return moves
+                self.boardArray[row][col] = None
+                self._add_jumps(piece, ((row, col),), capture_moves)
+                self.boardArray[row][col] = piece
+        if capture_moves or self.jumping is not None and player == self.turn:
+            return capture_moves
 
+        moves = []
+        for row, col in starts:
+            piece = self.boardArray[row][col]
+            if piece & pieces.KING:
+                directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+            else:
+                directions = [(-1, -1), (-1, 1)] if piece == pieces.PLAYER_MAN else [(1, -1), (1, 1)]
+            for dr, dc in directions:
+                if self._can_move((row, col), (row + dr, col + dc)):
+                    moves.append(((row, col), (row + dr, col + dc)))
+        return moves
 
-    def get_piece_moves(self, piece):
+    def _add_jumps(self, piece, path, moves):
+        # Jump sequences of piece, lifted off the board, on from the last
+        # square of path; jumped pieces are taken off while they are tried
+        row, col = path[-1]
+        if piece & pieces.KING:
+            directions = [(2, 2), (2, -2), (-2, 2), (-2, -2)]
+        else:
+            directions = [(2, 2), (2, -2)] if piece == pieces.AI_MAN else [(-2, 2), (-2, -2)]
+        extended = False
+        for dr, dc in directions:
+            newRow, newCol = row + dr, col + dc
+            if not (0 <= newRow < consts.BOARD_SIZE and 0 <= newCol < consts.BOARD_SIZE) or \
+               self.boardArray[newRow][newCol] is not None:
+                continue
+            midRow, midCol = row + dr // 2, col + dc // 2
+            mid_piece = self.boardArray[midRow][midCol]
+            if mid_piece is None or mid_piece & pieces.SIDE == piece & pieces.SIDE:
+                continue
+            extended = True
+            if piece == pieces.AI_MAN and newRow == consts.BOARD_SIZE - 1 or \
+               piece == pieces.PLAYER_MAN and newRow == 0:
+                # Crowning ends the move
+                moves.append(path + ((newRow, newCol),))
+                continue
+            self.boardArray[midRow][midCol] = None
+            self._add_jumps(piece, path + ((newRow, newCol),), moves)
+            self.boardArray[midRow][midCol] = mid_piece
+        if not extended and len(path) > 1:
+            moves.append(path)
+
+    def get_piece_moves(self, pos):
+        """The single steps or jumps the piece at pos may make next, as
+        (pos, newPos) pairs for move_piece."""
         moves = []
-        # capture_moves = []
+        row, col = pos
+        piece = self.boardArray[row][col]
         if piece is not None:
-            if piece.isKing:
+            if piece & pieces.KING:
                 directions = [(-1, -1), (-1, 1), (1, -1), (1, 1),(-2, -2), (-2, 2), (2, -2), (2, 2)]
             else:
-                directions = [(-1, -1), (-1, 1),(-2, -2), (-2, 2)] if piece.player == "Player" else [(1, -1), (1, 1),(2, -2), (2, 2)]
+                directions = [(-1, -1), (-1, 1),(-2, -2), (-2, 2)] if piece == pieces.PLAYER_MAN else [(1, -1), (1, 1),(2, -2), (2, 2)]
 
+            player = pieces.player(piece)
+            if self.jumping is not None and player == self.turn:
+                if pos != self.jumping:
+                    return moves
+                jumps_only = True
+            else:
+                jumps_only = self.must_capture(player)
             for dr, dc in directions:
-                newRow, newCol = piece.row + dr, piece.col + dc
-                if self.is_valid_move((piece.row, piece.col), (newRow, newCol)):
-                    # if abs(dr) == 2:
-                    #     capture_moves.append(((piece.row, piece.col), (newRow, newCol)))
-                    # else:
-                    moves.append(((piece.row, piece.col), (newRow, newCol)))
-        # print(capture_moves)
+                if jumps_only and abs(dr) == 1:
+                    continue
+                newRow, newCol = row + dr, col + dc
+                if self._can_move(pos, (newRow, newCol)):
+                    moves.append((pos, (newRow, newCol)))
         return moves
-        # return capture_moves if capture_moves else moves
-
 
     def apply_move(self, move):
-        prevPos, newPos = move
+        """Plays a move from get_all_valid_moves one step or jump at a time."""
+        prevPos = move[0]
         if self.boardArray[prevPos[0]][prevPos[1]] is None:
             print(f"Invalid move attempted: {move}")
             return
-        self.move_piece(prevPos, newPos)
+        for prevPos, newPos in zip(move, move[1:]):
+            self.move_piece(prevPos, newPos)
 
-    def highlight (self, pos, color="green"):
-        row, col = pos
-        if self.boardArray[row][col] is not None:
-            self.boardArray[row][col].hightlight()
-        else:
-            highlight_surface = pygame.Surface((consts.SQUARE_SIZE, consts.SQUARE_SIZE))
-            highlight_surface.set_colorkey((0, 0, 0))
-            highlight_surface.set_alpha(50)
-            
-            pygame.draw.rect(
-                highlight_surface,
-                color,
-                pygame.Rect(
-                    0, 0, 
-                    consts.SQUARE_SIZE,
-                    consts.SQUARE_SIZE
-                )
-            )
-            
-            self.window.blit(highlight_surface,
-                             (
-                                 col * consts.SQUARE_SIZE + consts.X_CENTER_OFFSET,
-                                 row * consts.SQUARE_SIZE + consts.Y_CENTER_OFFSET,
-                             ))
-            
     def is_kinging_move(self, move):
         """
         Check if a move results in the piece becoming a king.
         :param move: The move to check, given as a tuple (start_position, end_position).
         :return: True if the move results in the piece becoming a king, False otherwise.
         """
-        start_pos, end_pos = move
+        start_pos, end_pos = move[0], move[-1]
         start_row, start_col = start_pos
         end_row, end_col = end_pos
     
         piece = self.boardArray[start_row][start_col]
-        if piece is None or piece.isKing:
+        if piece is None or piece & pieces.KING:
             return False
 
         # Determine kinging condition based on player and board rows
-        if (piece.player == "AI" and end_row == 0) or (piece.player == "Player" and end_row == consts.BOARD_SIZE - 1):
+        if (piece == pieces.AI_MAN and end_row == 0) or (piece == pieces.PLAYER_MAN and end_row == consts.BOARD_SIZE - 1):
             return True
 
         return False
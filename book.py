@@ -0,0 +1,189 @@
+import argparse
+import collections
+import contextlib
+import io
+import mmap
+import random
+import struct
+import ai
+import bitboard
+
+# Opening book: moves for positions that come up early in every game, so the
+# AI can answer them without searching.
+#
+# The file is a header followed by (hash, move, weight) records sorted by
+# position hash, one record per book move. It is memory-mapped and searched
+# with a binary search, so opening it reads nothing but the header. Moves
+# are packed with bitboard.pack_move, whole paths included, so two
+# multi-jumps with the same ends stay apart.
+#
+#   python book.py build --games 200 --plies 12 --depth 4 --output book.bin
+#   python book.py show book.bin --fen "W:W21,...:B1,..."
+
+DEFAULT_PATH = "book.bin"
+
+MAGIC = b"CKBK"
+FORMAT_VERSION = 2
+# magic, format version, rules version, record count
+HEADER = struct.Struct("<4sHHI")
+# Zobrist hash, packed move, weight
+RECORD = struct.Struct("<QQH")
+
+MAX_WEIGHT = 0xFFFF
+
+
+class BookError(Exception):
+    pass
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            self.file.close()
+            raise BookError(f"{path} is not an opening book")
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise BookError(f"{path} is not an opening book")
+        magic, format_version, rules_version, self.records = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION or \
+           len(self.data) != HEADER.size + self.records * RECORD.size:
+            self.close()
+            raise BookError(f"{path} is not an opening book")
+        if rules_version != bitboard.RULES_VERSION:
+            self.close()
+            raise BookError(f"{path} was built for rules version {rules_version}, "
+                            f"not {bitboard.RULES_VERSION}")
+
+    def _record(self, index):
+        return RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+
+    def moves(self, position):
+        """Returns the book's [(move, weight)] for position; empty if it is
+        not in the book."""
+        key = position.hash
+        low, high = 0, self.records
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        for index in range(low, self.records):
+            record_key, move, weight = self._record(index)
+            if record_key != key:
+                break
+            moves.append((bitboard.unpack_move(move), weight))
+        return moves
+
+    def choose(self, position, rng=random):
+        """Picks a book move for position at random by weight, or returns None
+        if it has none."""
+        legal = set(position.get_all_valid_moves())
+        moves = [(move, weight) for move, weight in self.moves(position) if move in legal]
+        if not moves:
+            return None
+        return rng.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+    def __len__(self):
+        return self.records
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def load(path):
+    """Opens the book at path, or returns None if there is no usable book
+    there."""
+    try:
+        return OpeningBook(path)
+    except FileNotFoundError:
+        return None
+    except BookError as error:
+        print(f"[DEBUG] book.py: {error}")
+        return None
+
+
+def write(path, entries):
+    """Writes {(hash, move): weight} as a book file."""
+    records = sorted((key, bitboard.pack_move(move), min(weight, MAX_WEIGHT))
+                     for (key, move), weight in entries.items() if len(move) <= bitboard.MAX_PACKED_SQUARES)
+    with open(path, "wb") as book_file:
+        book_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, bitboard.RULES_VERSION, len(records)))
+        for record in records:
+            book_file.write(RECORD.pack(*record))
+
+
+# Building
+#
+# Self-play games from the initial position. Every move of both sides is
+# chosen by scoring each legal move with a fixed-depth search and picking at
+# random among those close to the best, so the games branch. A move's weight
+# is the number of games that played it.
+
+def _scored_moves(searcher, position, depth):
+    searcher.transposition_table.new_search()
+    searcher._new_search_ordering()
+    scored = []
+    for move in position.get_all_valid_moves():
+        child = position.play(move)
+        score = searcher._minimax(child, depth - 1, child.turn == bitboard.AI, float('-inf'), float('inf'))
+        scored.append((move, score))
+    return scored
+
+
+def build(games, plies, depth, margin=0.25, seed=0):
+    rng = random.Random(seed)
+    random.seed(seed)
+    searcher = ai.AI(None, depth=depth)
+    entries = collections.Counter()
+    for game in range(games):
+        position = bitboard.Position.initial()
+        for ply in range(plies):
+            scored = _scored_moves(searcher, position, depth)
+            if not scored:
+                break
+            sign = 1 if position.turn == bitboard.AI else -1
+            best = max(sign * score for _, score in scored)
+            move = rng.choice([move for move, score in scored if sign * score >= best - margin])
+            entries[(position.hash, move)] += 1
+            position.make_move(move)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the opening book")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="build a book from self-play games")
+    build_parser.add_argument("--games", type=int, default=200)
+    build_parser.add_argument("--plies", type=int, default=12, help="book moves per game")
+    build_parser.add_argument("--depth", type=int, default=4, help="search depth for scoring moves")
+    build_parser.add_argument("--margin", type=float, default=0.25,
+                              help="play any move scoring within this of the best")
+    build_parser.add_argument("--seed", type=int, default=0)
+    build_parser.add_argument("--output", default=DEFAULT_PATH)
+    show_parser = commands.add_parser("show", help="list the book moves of a position")
+    show_parser.add_argument("book", nargs="?", default=DEFAULT_PATH)
+    show_parser.add_argument("--fen", help="position to look up (default: the initial position)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        with contextlib.redirect_stdout(io.StringIO()):
+            entries = build(args.games, args.plies, args.depth, args.margin, args.seed)
+        write(args.output, entries)
+        print(f"{len(entries)} moves in {len({key for key, _ in entries})} positions written to {args.output}")
+    else:
+        book = OpeningBook(args.book)
+        position = bitboard.Position.from_fen(args.fen) if args.fen else bitboard.Position.initial()
+        for move, weight in book.moves(position):
+            print(f"{bitboard.move_text(move)}\t{weight}")
+        book.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import ai
+import bitboard
+import board
+import pieces
+
+# Headless engine server: many clients and games served from one process
+# with asyncio, with the searches running on a shared process pool so
+# throughput grows with cores, not connections.
+#
+# Clients connect over TCP and exchange JSON objects, one per line. A client
+# can keep several sessions, each with its own Board and AI settings:
+#
+#   {"cmd": "new", "session": "g1", "settings": {"depth": 6}, "fen": "W:W21,...:B1,..."}
+#   {"cmd": "move", "session": "g1", "move": "22-18"}
+#   {"cmd": "search", "session": "g1", "id": "r1", "deadline_ms": 2000, "apply": true}
+#   {"cmd": "cancel", "id": "r1"}
+#   {"cmd": "close", "session": "g1"}
+#
+# A search is answered with "queued", then "progress" after each completed
+# depth, then one of "bestmove", "cancelled" or "timeout". Searches wait in a
+# bounded queue for a free worker; a request whose deadline passes stops
+# (a timed search still answers with its deepest result) and one that is
+# cancelled is dropped, whether it is queued or running.
+#
+#   python engine_server.py --port 8765 --workers 4
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# AI keyword arguments a client may set, with a test of their values
+SETTINGS = {
+    "level": lambda value: value in ai.LEVEL_DEPTHS,
+    "depth": lambda value: value is None or type(value) is int and 0 < value <= ai.MAX_DEPTH,
+    "time_limit_ms": lambda value: value is None or _is_number(value) and value > 0,
+    "quiescence": lambda value: isinstance(value, bool),
+    "tablebases": lambda value: value is None or isinstance(value, str),
+    "book": lambda value: value is None or isinstance(value, str),
+    "center_weight": _is_number,
+    "mobility_weight": _is_number,
+}
+
+# AIs each worker keeps warm, least recently used first out
+MAX_SEARCHERS = 4
+
+_searchers = collections.OrderedDict()
+_progress = None
+
+
+def _init_worker(progress):
+    global _progress
+    _progress = progress
+
+
+def check_settings(settings):
+    if not isinstance(settings, dict):
+        raise ValueError("settings must be an object")
+    unknown = set(settings) - set(SETTINGS)
+    if unknown:
+        raise ValueError(f"unknown settings {sorted(unknown)}")
+    for name, value in settings.items():
+        if not SETTINGS[name](value):
+            raise ValueError(f"bad value for {name}: {value!r}")
+
+
+def _search(task):
+    # Runs in a pool worker; the AIs of the last few settings are kept so
+    # their tables stay warm between requests
+    key, packed, settings, stop = task
+    settings_key = tuple(sorted(settings.items()))
+    searcher = _searchers.get(settings_key)
+    if searcher is None:
+        searcher = _searchers[settings_key] = ai.AI(None, **settings)
+        if len(_searchers) > MAX_SEARCHERS:
+            _searchers.popitem(last=False)[1].close()
+    else:
+        _searchers.move_to_end(settings_key)
+    position = bitboard.Position.unpack(packed)
+    mirrored = position.turn == bitboard.PLAYER
+
+    def report(depth, move, score):
+        if mirrored:
+            move = bitboard.Position.mirror_move(move)
+        _progress.put((key, depth, move, score))
+
+    searcher.on_iteration = report
+    searcher.stop_event = stop
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return searcher.analyze(position)
+    except ai.SearchTimeout:
+        return None
+
+
+def parse_move(text):
+    """"22x15x8" -> (21, 14, 7)"""
+    squares = tuple(int(square) - 1 for square in text.replace("x", "-").split("-"))
+    if len(squares) < 2 or not all(0 <= square < bitboard.SQUARES for square in squares):
+        raise ValueError(f"bad move {text!r}")
+    return squares
+
+
+class Session:
+    def __init__(self, settings, fen=None):
+        self.settings = settings
+        self.board = board.Board()
+        if fen:
+            bitboard.Position.from_fen(fen).to_board(self.board)
+
+    def play(self, move):
+        # A single step or jump, which may leave a multi-jump to finish, or a
+        # whole move
+        board_move = bitboard.Position.to_board_move(move)
+        if len(board_move) > 2:
+            legal = board_move in self.board.get_all_valid_moves(self.board.turn)
+        else:
+            start, end = board_move
+            piece = self.board.boardArray[start[0]][start[1]]
+            legal = piece is not None and pieces.player(piece) == self.board.turn and \
+                self.board.is_valid_move(start, end)
+        if not legal:
+            raise ValueError(f"illegal move {bitboard.move_text(move)}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            self.board.apply_move(board_move)
+
+    def state(self, name):
+        return {"event": "position", "session": name, "fen": bitboard.Position.from_board(self.board).to_fen(),
+                "winner": self.board.check_winner()}
+
+
+class Request:
+    def __init__(self, key, connection, request_id, session_name, session, stop, apply):
+        self.key = key
+        self.connection = connection
+        self.id = request_id
+        self.session_name = session_name
+        self.session = session
+        self.packed = bitboard.Position.from_board(session.board).pack()
+        self.stop = stop
+        self.apply = apply
+        # None while the request is live, else "cancelled" or "timeout"
+        self.outcome = None
+        self.timer = None
+
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.sessions = {}
+        self.requests = {}
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write((json.dumps(message) + "\n").encode())
+
+
+class EngineServer:
+    def __init__(self, workers=None, max_queue=256):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.manager = multiprocessing.Manager()
+        self.progress = self.manager.Queue()
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                           initargs=(self.progress,))
+        self.requests = {}
+        self.keys = itertools.count()
+
+    async def start(self, host, port):
+        self.queue = asyncio.Queue(self.max_queue)
+        self.tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._forward_progress()))
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        for request in self.requests.values():
+            request.stop.set()
+        self.progress.put(None)
+        self.pool.shutdown(cancel_futures=True)
+        self.manager.shutdown()
+
+    async def _handle_connection(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = None
+                try:
+                    message = json.loads(line)
+                    reply = self._handle(connection, message)
+                except (ValueError, KeyError, TypeError) as error:
+                    reply = {"event": "error", "error": str(error)}
+                    if isinstance(message, dict) and "id" in message:
+                        reply["id"] = message["id"]
+                if reply is not None:
+                    connection.send(reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for request in list(connection.requests.values()):
+                self._cancel(request)
+            writer.close()
+
+    def _handle(self, connection, message):
+        command = message["cmd"]
+        if command == "new":
+            name = message["session"]
+            settings = message.get("settings", {})
+            check_settings(settings)
+            session = connection.sessions[name] = Session(settings, message.get("fen"))
+            return session.state(name)
+        if command == "move":
+            name = message["session"]
+            session = connection.sessions[name]
+            session.play(parse_move(message["move"]))
+            return session.state(name)
+        if command == "search":
+            return self._submit(connection, message)
+        if command == "cancel":
+            request = connection.requests.get(message["id"])
+            if request is not None:
+                self._cancel(request)
+            return None
+        if command == "close":
+            connection.sessions.pop(message["session"], None)
+            return None
+        raise ValueError(f"unknown command {command!r}")
+
+    def _submit(self, connection, message):
+        # Everything is checked before the request is queued, so a rejected
+        # one never runs
+        request_id = message["id"]
+        if not isinstance(request_id, (str, int)) or isinstance(request_id, bool):
+            raise ValueError(f"bad request id {request_id!r}")
+        deadline_ms = message.get("deadline_ms")
+        if deadline_ms is not None and not (_is_number(deadline_ms) and deadline_ms > 0):
+            raise ValueError(f"bad deadline_ms {deadline_ms!r}")
+        apply = message.get("apply", False)
+        if not isinstance(apply, bool):
+            raise ValueError(f"bad apply {apply!r}")
+        if request_id in connection.requests:
+            raise ValueError(f"request {request_id!r} is already running")
+        name = message["session"]
+        if connection.sessions[name].board.jumping is not None:
+            raise ValueError("the side to move has a multi-jump to finish")
+        request = Request(next(self.keys), connection, request_id, name, connection.sessions[name],
+                          self.manager.Event(), apply)
+        try:
+            self.queue.put_nowait(request)
+        except asyncio.QueueFull:
+            return {"event": "error", "id": request_id, "error": "queue full"}
+        self.requests[request.key] = request
+        connection.requests[request_id] = request
+        if deadline_ms is not None:
+            request.timer = asyncio.get_running_loop().call_later(deadline_ms / 1000, self._expire, request)
+        return {"event": "queued", "id": request_id, "queued": self.queue.qsize()}
+
+    def _cancel(self, request):
+        if request.outcome is None:
+            request.outcome = "cancelled"
+            request.stop.set()
+
+    def _expire(self, request):
+        if request.outcome is None:
+            request.outcome = "timeout"
+            request.stop.set()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            request = await self.queue.get()
+            result = None
+            error = None
+            if request.outcome is None:
+                task = (request.key, request.packed, request.session.settings, request.stop)
+                try:
+                    result = await loop.run_in_executor(self.pool, _search, task)
+                except Exception as search_error:
+                    error = str(search_error) or type(search_error).__name__
+            self._finish(request, result, error)
+
+    def _finish(self, request, result, error=None):
+        del self.requests[request.key]
+        del request.connection.requests[request.id]
+        if request.timer is not None:
+            request.timer.cancel()
+        connection = request.connection
+        found_move = result is not None and result["move"] is not None
+        if request.outcome == "cancelled" or request.outcome == "timeout" and not found_move:
+            connection.send({"event": request.outcome, "id": request.id})
+            return
+        if result is None:
+            connection.send({"event": "error", "id": request.id, "error": error or "search failed"})
+            return
+
+        reply = {"event": "bestmove", "id": request.id, "timeout": request.outcome == "timeout",
+                 "move": None if result["move"] is None else bitboard.move_text(result["move"]),
+                 "score": result["score"], "pv": [bitboard.move_text(move) for move in result["pv"]],
+                 "depth": result["depth"], "nodes": result["nodes"]}
+        session = request.session
+        # The move is only played if the session is still where it was searched
+        if request.apply and result["move"] is not None and \
+           session is connection.sessions.get(request.session_name) and \
+           bitboard.Position.from_board(session.board).pack() == request.packed:
+            session.play(result["move"])
+            reply.update(session.state(request.session_name), event="bestmove")
+        connection.send(reply)
+
+    async def _forward_progress(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self.progress.get)
+            if item is None:
+                return
+            key, depth, move, score = item
+            request = self.requests.get(key)
+            if request is not None and request.outcome is None:
+                request.connection.send({"event": "progress", "id": request.id, "depth": depth,
+                                         "move": bitboard.move_text(move), "score": score})
+
+
+async def serve(host, port, workers, max_queue):
+    server = EngineServer(workers, max_queue)
+    tcp_server = await server.start(host, port)
+    print(f"Engine server listening on {host}:{port} with {server.workers} workers")
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the AI to many games over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="search processes (default: one per CPU)")
+    parser.add_argument("--max-queue", type=int, default=256, help="searches that may wait for a worker")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_queue))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
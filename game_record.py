@@ -0,0 +1,264 @@
+import datetime
+import struct
+import bitboard
+import board
+
+# Game records: writers that append each move to disk as it is played, a
+# reader that yields the games of a file one at a time, and a replay that
+# rebuilds the Board after every move.
+#
+# Two formats are supported, chosen by file extension:
+# - PDN (.pdn): tag pairs and movetext such as "1. 22-18 11-15 2. 18x11 8x15".
+#   White is the Player and Black the AI, squares are numbered 1-32 as in
+#   bitboard's FEN strings, and a multi-jump by one piece is written as one
+#   move, "22x15x8". The game starts with White to move, where standard PDN
+#   has Black move first, so every game gets a FEN tag; a game read without
+#   one starts from the standard position with Black to move.
+# - Compact binary (anything else): a file header, then for each game a
+#   start marker and the packed initial position, two bytes (from, to) per
+#   single step or jump, and an end marker with the result. The header holds
+#   the rules version, and files from other rules are refused.
+#
+#   writer = game_record.open_writer("games.pdn")
+#   writer.start_game(game_board)
+#   game_board.on_move = writer.add_move
+#   ...
+#   writer.end_game(winner)
+#
+#   for game in game_record.read_games("games.pdn"):
+#       for game_board in game_record.replay(game):
+#           ...
+
+# Results: the winning side, "draw", or None for a game that did not finish
+PDN_RESULTS = {"Player": "1-0", "AI": "0-1", "draw": "1/2-1/2", None: "*"}
+RESULTS_BY_PDN = {text: result for result, text in PDN_RESULTS.items()}
+# Initial position of a PDN game without a FEN tag
+PDN_START = bitboard.Position(bitboard.AI_START, bitboard.PLAYER_START, 0, bitboard.AI).to_fen()
+
+MAGIC = b"CKGR"
+FORMAT_VERSION = 1
+# magic, format version, rules version
+HEADER = struct.Struct("<4sHH")
+GAME_START = 0xFE
+GAME_END = 0xFF
+# AI bits, Player bits, kings, AI to move
+START = struct.Struct("<III?")
+RESULT_CODES = {None: 0, "AI": 1, "Player": 2, "draw": 3}
+RESULTS_BY_CODE = {code: result for result, code in RESULT_CODES.items()}
+
+
+class GameRecord:
+    def __init__(self, start, moves=None, result=None, tags=None):
+        # FEN of the initial position
+        self.start = start
+        # Single steps and jumps as (from_square, to_square), in the order
+        # Board.move_piece played them
+        self.moves = moves if moves is not None else []
+        self.result = result
+        self.tags = tags if tags is not None else {}
+
+    def __repr__(self):
+        return f"GameRecord({self.start!r}, {len(self.moves)} moves, result={self.result!r})"
+
+
+def replay(game):
+    """Yields the Board after each move of game; the same Board object is
+    updated in place."""
+    game_board = board.Board()
+    bitboard.Position.from_fen(game.start).to_board(game_board)
+    for move in game.moves:
+        game_board.apply_move(bitboard.Position.to_board_move(move))
+        yield game_board
+
+
+def open_writer(path):
+    if path.endswith(".pdn"):
+        return PdnWriter(path)
+    return CompactWriter(path)
+
+
+def read_games(path):
+    if path.endswith(".pdn"):
+        return read_pdn(path)
+    return read_compact(path)
+
+
+def _square_move(move):
+    # Board ((row, col), ...) or bitboard (from, ...) moves
+    if isinstance(move[0], tuple):
+        return bitboard.Position.from_board_move(move)
+    return move
+
+
+class PdnWriter:
+    def __init__(self, path):
+        self.file = open(path, "a")
+        self.in_game = False
+
+    def start_game(self, game_board, tags=None):
+        if self.in_game:
+            self.end_game(None)
+        position = bitboard.Position.from_board(game_board)
+        all_tags = {"Event": "Checkers", "Date": datetime.date.today().strftime("%Y.%m.%d"),
+                    "White": "Player", "Black": "AI"}
+        all_tags.update(tags or {})
+        all_tags["FEN"] = position.to_fen()
+        for name, value in all_tags.items():
+            self.file.write(f'[{name} "{value}"]\n')
+        self.file.write("\n")
+        self.first_side = position.turn
+        self.move_number = 0
+        self.last_side = None
+        self.last_end = None
+        self.last_was_jump = False
+        self.in_game = True
+        self.file.flush()
+
+    def add_move(self, side, move):
+        """Appends a move of side: a single step or jump, or a whole
+        multi-jump."""
+        squares = _square_move(move)
+        jump = bitboard.Position.is_capture_move(squares)
+        if side == self.last_side and jump and self.last_was_jump and squares[0] == self.last_end:
+            # The same piece jumping on: one PDN move
+            text = "".join(f"x{square + 1}" for square in squares[1:])
+        else:
+            text = " " if self.last_side is not None else ""
+            if side != self.last_side and side == self.first_side:
+                self.move_number += 1
+                text += f"{self.move_number}. "
+            text += bitboard.move_text(squares)
+        self.file.write(text)
+        self.file.flush()
+        self.last_side, self.last_end, self.last_was_jump = side, squares[-1], jump
+
+    def end_game(self, result):
+        if not self.in_game:
+            return
+        self.file.write(("" if self.last_side is None else " ") + PDN_RESULTS[result] + "\n\n")
+        self.file.flush()
+        self.in_game = False
+
+    def close(self):
+        self.end_game(None)
+        self.file.close()
+
+
+def _pdn_tokens(lines):
+    for line in lines:
+        line = line.strip()
+        if line.startswith("["):
+            yield line
+            continue
+        for token in line.split():
+            yield token
+
+
+def read_pdn(path):
+    """Yields the games of a PDN file as GameRecords, reading it lazily."""
+    with open(path) as pdn_file:
+        game = None
+        for token in _pdn_tokens(pdn_file):
+            if token.startswith("["):
+                if game is None or game.moves:
+                    if game is not None:
+                        yield game
+                    game = GameRecord(PDN_START)
+                name, _, value = token[1:-1].partition(" ")
+                game.tags[name] = value.strip('"')
+                if name == "FEN":
+                    game.start = game.tags[name]
+                continue
+            if game is None:
+                game = GameRecord(PDN_START)
+            if token in RESULTS_BY_PDN:
+                game.result = RESULTS_BY_PDN[token]
+                yield game
+                game = None
+            elif token.endswith("."):
+                continue
+            else:
+                squares = [int(square) - 1 for square in token.replace("x", "-").split("-")]
+                game.moves.extend(zip(squares, squares[1:]))
+        if game is not None and (game.moves or game.tags):
+            yield game
+
+
+def _check_header(path, header):
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path} is not a game record file")
+    magic, format_version, rules_version = HEADER.unpack(header)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a game record file")
+    if rules_version != bitboard.RULES_VERSION:
+        raise ValueError(f"{path} was recorded under rules version {rules_version}, "
+                         f"not {bitboard.RULES_VERSION}")
+
+
+class CompactWriter:
+    def __init__(self, path):
+        self.file = open(path, "a+b")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, bitboard.RULES_VERSION))
+        else:
+            # Games are only added to a file of the same rules
+            self.file.seek(0)
+            header = self.file.read(HEADER.size)
+            try:
+                _check_header(path, header)
+            except ValueError:
+                self.file.close()
+                raise
+        self.in_game = False
+
+    def start_game(self, game_board, tags=None):
+        if self.in_game:
+            self.end_game(None)
+        position = bitboard.Position.from_board(game_board)
+        self.file.write(bytes((GAME_START,)) +
+                        START.pack(position.ai, position.player, position.kings, position.turn == bitboard.AI))
+        self.file.flush()
+        self.in_game = True
+
+    def add_move(self, side, move):
+        squares = _square_move(move)
+        for step in zip(squares, squares[1:]):
+            self.file.write(bytes(step))
+        self.file.flush()
+
+    def end_game(self, result):
+        if not self.in_game:
+            return
+        self.file.write(bytes((GAME_END, RESULT_CODES[result])))
+        self.file.flush()
+        self.in_game = False
+
+    def close(self):
+        self.end_game(None)
+        self.file.close()
+
+
+def read_compact(path):
+    """Yields the games of a compact file as GameRecords, reading it lazily."""
+    with open(path, "rb") as game_file:
+        _check_header(path, game_file.read(HEADER.size))
+        game = None
+        while True:
+            marker = game_file.read(1)
+            if not marker:
+                break
+            marker = marker[0]
+            if marker == GAME_START:
+                if game is not None:
+                    yield game
+                ai, player, kings, ai_to_move = START.unpack(game_file.read(START.size))
+                position = bitboard.Position(ai, player, kings, bitboard.AI if ai_to_move else bitboard.PLAYER)
+                game = GameRecord(position.to_fen())
+            elif marker == GAME_END:
+                game.result = RESULTS_BY_CODE[game_file.read(1)[0]]
+                yield game
+                game = None
+            else:
+                game.moves.append((marker, game_file.read(1)[0]))
+        if game is not None:
+            yield game
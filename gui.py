@@ -18,6 +18,10 @@ class GUI:
         sign_board_x, sign_board_y = self.sign_board_image.get_size()
         self.sign_board_image = pygame.transform.scale(self.sign_board_image, (sign_board_x / 4.8, sign_board_y / 4.8))
         self.sign_board_image_flipped = pygame.transform.flip(self.sign_board_image, False, True)
+
+        # Turn sign and thinking indicator as last drawn by update_status
+        self.shown_status = None
+        self.status_rects = []
         
 
     def display_turn(self, turn):
@@ -32,14 +36,44 @@ class GUI:
                             consts.Y_CENTER_OFFSET * 16 - text_surface.get_height() / 2)
                             
         
-        self.window.blit(self.sign_board_image if turn == "Player" else self.sign_board_image_flipped, 
+        sign_rect = self.window.blit(self.sign_board_image if turn == "Player" else self.sign_board_image_flipped, 
                          (consts.X_CENTER_OFFSET + 8 * consts.SQUARE_SIZE + 20,
                          consts.Y_CENTER_OFFSET * 16 - text_surface.get_height() / 2 - 30) if turn == "Player" else \
                         (consts.X_CENTER_OFFSET - text_surface.get_width() - 100,
                          consts.Y_CENTER_OFFSET * 2 - text_surface.get_height() / 2 - 60)
                          )
         
-        self.window.blit(text_surface, text_position)
+        return sign_rect.union(self.window.blit(text_surface, text_position))
+
+    def display_thinking(self):
+        """Shows that the AI is searching, with dots that cycle over time."""
+        dots = "." * (pygame.time.get_ticks() // 400 % 4)
+        text_surface = self.font.render(f"Thinking{dots}", True, "black")
+        # Left-aligned at the width of the longest text so it doesn't jitter
+        return self.window.blit(text_surface,
+                                (consts.X_CENTER_OFFSET - self.font.size("Thinking...")[0] - 60,
+                                 consts.Y_CENTER_OFFSET * 2 + 60))
+
+    def update_status(self, turn, thinking, restore):
+        """Redraws the turn sign and thinking indicator if they changed since
+        the last call and returns the rects to pass to pygame.display.update.
+        restore(rect) puts the background back where they were."""
+        status = (turn, pygame.time.get_ticks() // 400 % 4 if thinking else None)
+        if status == self.shown_status:
+            return []
+        self.shown_status = status
+
+        dirty = [restore(rect) for rect in self.status_rects]
+        self.status_rects = [self.display_turn(turn)]
+        if thinking:
+            self.status_rects.append(self.display_thinking())
+        return dirty + self.status_rects
+
+    def invalidate(self):
+        """Makes the next update_status draw again, after the window was
+        redrawn."""
+        self.shown_status = None
+        self.status_rects = []
 
     def invoke_try_again(self):
         self.play_again = True
@@ -1,147 +1,195 @@
 import pygame
 import board
+import book
+import game_record
+import pieces
+import tablebase
+import renderer
 import util
-import ai
+from search_worker import SearchWorker
 import gui
 import time
 import pygame_widgets
 
-# pygame setup
-pygame.init()
-window = pygame.display.set_mode((1280, 720), 0, 32)
-clock = pygame.time.Clock()
+# Seconds the AI takes at least before moving, so its moves can be followed
+AI_MOVE_DELAY = 0.5
 
-running = True
-paused = True
+# Every game played is appended to this file
+GAMES_PATH = "games.pdn"
 
-# Starts as true by default to show the difficuly selection screen
-play_again = True 
+# The AI's transposition table is kept in this file between games and runs
+TT_PATH = "search.tt"
 
-# Initialize board and gui object
-game_board = board.Board(window)
-game_gui = gui.GUI(window)
 
-# Selected piece tracking
-selected_piece = None
-is_piece_selected = False
+def main():
+    # pygame setup
+    pygame.init()
+    window = pygame.display.set_mode((1280, 720), 0, 32)
+    clock = pygame.time.Clock()
 
-winner = None
+    running = True
+    paused = True
 
-while running:
-    events = pygame.event.get()
-    for event in events:
-        if event.type == pygame.QUIT:
-            running = False
-            
-        if (event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.MOUSEBUTTONUP) and not paused:
-            if not is_piece_selected:
-                mouse_x, mouse_y = pygame.mouse.get_pos()
-                row, col = util.getPosFromMouseCords(mouse_x, mouse_y)
-
-                # If a piece is clicked, select it
-                if ( row >=0 and row <=8 and col >= 0 and col <= 8):
-                    if game_board.boardArray[row][col] is not None \
-                    and game_board.boardArray[row][col].player == "Player" \
-                        and not paused:
-                        selected_piece = (row, col)
-                        is_piece_selected = True
-                        print(f"[DEBUG] launch.py: Piece selected at: {selected_piece}")
-            else:
-                if selected_piece is not None and not paused:
+    # Starts as true by default to show the difficuly selection screen
+    play_again = True 
+
+    # Initialize board, renderer and gui object
+    game_board = board.Board()
+    board_renderer = renderer.BoardRenderer(window)
+    game_gui = gui.GUI(window)
+
+    # Selected piece tracking
+    selected_piece = None
+    is_piece_selected = False
+
+    winner = None
+
+    # Set when the whole window has to be redrawn, e.g. after a menu
+    needs_redraw = True
+
+    # AI searches run in a background process; ai_turn_started is when the
+    # current AI turn's search was started
+    search_worker = SearchWorker()
+    game_writer = game_record.open_writer(GAMES_PATH)
+    ai_options = {}
+    ai_turn_started = None
+
+    while running:
+        events = pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+                
+            if (event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.MOUSEBUTTONUP) and not paused:
+                if not is_piece_selected:
                     mouse_x, mouse_y = pygame.mouse.get_pos()
                     row, col = util.getPosFromMouseCords(mouse_x, mouse_y)
 
-                    # Check if the move is valid (valid square)
-                    if (row >=0 and row <=7 and col >= 0 and col <= 7):
-                        if game_board.is_valid_move(selected_piece, (row, col)):
-                            game_board.move_piece(selected_piece, (row, col))
-                            selected_piece = None
-                            is_piece_selected = False
-                        elif game_board.boardArray[row][col] is not None \
-                            and game_board.boardArray[row][col].player == "Player" \
+                    # If a piece is clicked, select it
+                    if ( row >=0 and row <=8 and col >= 0 and col <= 8):
+                        if game_board.boardArray[row][col] is not None \
+                        and game_board.boardArray[row][col] & pieces.PLAYER \
                             and not paused:
                             selected_piece = (row, col)
                             is_piece_selected = True
                             print(f"[DEBUG] launch.py: Piece selected at: {selected_piece}")
-                                    
-                        else:
-                            selected_piece = None
-                            is_piece_selected = False
-
-    winner = game_board.check_winner()
-    if winner and not paused:
-        print(f"[DEBUG] launch.py: {winner} wins the game!")
-        paused = True
-
-    if not paused:
-        # Clear screen
-        window.fill((255,165,79))
-        
-        # Draw board and pieces
-        game_board.draw_board()
-        game_board.draw_pieces()
-
-        if selected_piece:
-            game_board.highlight(selected_piece)
-            
-            row, col = selected_piece
-            for currPos, newPos in game_board.get_piece_moves(game_board.boardArray[row][col]):
-                game_board.highlight(newPos)
+                else:
+                    if selected_piece is not None and not paused:
+                        mouse_x, mouse_y = pygame.mouse.get_pos()
+                        row, col = util.getPosFromMouseCords(mouse_x, mouse_y)
+
+                        # Check if the move is valid (valid square)
+                        if (row >=0 and row <=7 and col >= 0 and col <= 7):
+                            if game_board.is_valid_move(selected_piece, (row, col)):
+                                game_board.move_piece(selected_piece, (row, col))
+                                selected_piece = None
+                                is_piece_selected = False
+                            elif game_board.boardArray[row][col] is not None \
+                                and game_board.boardArray[row][col] & pieces.PLAYER \
+                                and not paused:
+                                selected_piece = (row, col)
+                                is_piece_selected = True
+                                print(f"[DEBUG] launch.py: Piece selected at: {selected_piece}")
+                                        
+                            else:
+                                selected_piece = None
+                                is_piece_selected = False
+
+        winner = game_board.check_winner()
+        if winner and not paused:
+            print(f"[DEBUG] launch.py: {winner} wins the game!")
+            paused = True
+            search_worker.cancel()
+            ai_turn_started = None
+            game_writer.end_game(winner)
+
+        # AI's turn: the search runs in the worker process while the loop keeps
+        # drawing, and its move is played once it is done and AI_MOVE_DELAY has
+        # passed
+        if game_board.turn == "AI" and not paused:
+            if ai_turn_started is None:
+                print("[DEBUG] launch.py: AI's turn...")
+                search_worker.start_search(game_board, ai_options)
+                ai_turn_started = time.time()
+            elif search_worker.poll() and time.time() - ai_turn_started >= AI_MOVE_DELAY:
+                ai_turn_started = None
+                best_move = search_worker.best_move
+                if best_move:
+                    game_board.apply_move(best_move)  # AI makes its move
+                    # game_board.turn = "Player"  # Switch turn to the player after AI's move
+                    if game_board.turn == "Player":
+                        # Search ahead on the Player's time
+                        search_worker.start_ponder(game_board, ai_options)
+                else:
+                    print("[DEBUG] launch.py: AI has no valid moves! Game Over.")
+                    # paused = True
             
-        # Display current turn
-        game_gui.display_turn(game_board.turn)
-
-        pygame.display.update()
-    
-    # AI's turn
-    if game_board.turn == "AI" and not paused:
-        time.sleep(0.5)
-        print("[DEBUG] launch.py: AI's turn...")
-        best_move = game_ai.get_best_move()
-        if best_move:
-            game_board.apply_move(best_move)  # AI makes its move
-            # game_board.turn = "Player"  # Switch turn to the player after AI's move
+        pygame_widgets.update(events)
+
+        if paused:
+            # The menus are drawn over the board, so the whole window is
+            # redrawn while they show
+            board_renderer.draw_board()
+            board_renderer.draw_pieces(game_board)
+
+            if selected_piece:
+                board_renderer.highlight(game_board, selected_piece)
+
+                row, col = selected_piece
+                for currPos, newPos in game_board.get_piece_moves((row, col)):
+                    board_renderer.highlight(game_board, newPos)
+
+            if play_again:
+                new_difficulty_level = game_gui.display_choose_difficulty(events)
+                if new_difficulty_level:
+                    winner = None
+                    selected_piece = None
+                    search_worker.cancel()
+                    ai_turn_started = None
+                    game_board = board.Board()
+                    ai_options = {"level": new_difficulty_level, "book": book.DEFAULT_PATH,
+                                  "tablebases": tablebase.DEFAULT_DIRECTORY, "tt_path": TT_PATH}
+                    game_writer.start_game(game_board, {"Black": f"AI ({new_difficulty_level})"})
+                    game_board.on_move = game_writer.add_move
+                    game_gui = gui.GUI(window)
+                    paused = False
+                    play_again = False
+            elif winner:
+                # TODO: Implement game over!
+                play_again = game_gui.display_game_over(winner, pygame.event.get())
+
+            pygame.display.update()
+            needs_redraw = True
         else:
-            print("[DEBUG] launch.py: AI has no valid moves! Game Over.")
-            # paused = True
-        
-    pygame_widgets.update(events)
-
-    # Clear screen
-    window.fill((255,165,79))
-
-    # Draw board and pieces
-    
-    game_board.draw_board()
-    game_board.draw_pieces()
-    
-    if selected_piece:
-        game_board.highlight(selected_piece)
-        
-        row, col = selected_piece
-        for currPos, newPos in game_board.get_piece_moves(game_board.boardArray[row][col]):
-            game_board.highlight(newPos)
-
-    if not paused:
-        # Display current turn
-        game_gui.display_turn(game_board.turn)
-    
-    if paused:        
-        if play_again:
-            new_difficulty_level = game_gui.display_choose_difficulty(events)
-            if new_difficulty_level:
-                winner = None
-                selected_piece = None
-                game_board = board.Board(window)
-                game_ai = ai.AI(game_board, level=new_difficulty_level)
-                game_gui = gui.GUI(window)
-                paused = False
-                play_again = False
-        elif winner:
-            # TODO: Implement game over!
-            play_again = game_gui.display_game_over(winner, pygame.event.get())
-
-    pygame.display.update()
-    clock.tick(60)
-
-pygame.quit()
+            # Only what changed since the last frame is drawn and updated
+            dirty = []
+            if needs_redraw:
+                dirty.append(board_renderer.redraw())
+                game_gui.invalidate()
+                needs_redraw = False
+
+            highlighted = set()
+            if selected_piece:
+                highlighted.add(selected_piece)
+
+                row, col = selected_piece
+                for currPos, newPos in game_board.get_piece_moves((row, col)):
+                    highlighted.add(newPos)
+
+            # The status goes first: clearing it can uncover board squares,
+            # which update() then redraws
+            dirty += game_gui.update_status(game_board.turn, search_worker.is_thinking(), board_renderer.restore)
+            dirty += board_renderer.update(game_board, highlighted)
+            pygame.display.update(dirty)
+
+        clock.tick(60)
+
+    search_worker.close()
+    game_writer.close()
+    pygame.quit()
+
+
+# The guard keeps the search worker process, which imports this module on
+# platforms that spawn processes, from opening a second window
+if __name__ == "__main__":
+    main()
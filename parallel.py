@@ -0,0 +1,97 @@
+import multiprocessing
+import time
+import ai
+import bitboard
+
+# Parallel root search: each root move is searched by a worker process with
+# its own AI and transposition table. Positions travel as Position.pack()
+# tuples, and the best root score found so far is kept in shared memory.
+# Workers read it when they start a move and again at every clock check, so
+# a move in progress is narrowed as soon as another worker improves on it.
+#
+# A time limit is sent as the time left rather than a clock reading, since
+# perf_counter values mean nothing in another process; each worker starts
+# its own deadline on the first move it gets of a search.
+
+_worker_ai = None
+_shared_alpha = None
+_search_id = None
+_deadline = None
+
+
+def _init_worker(shared_alpha, options):
+    global _worker_ai, _shared_alpha
+    _worker_ai = ai.AI(None, **options)
+    _worker_ai.shared_alpha = shared_alpha
+    _shared_alpha = shared_alpha
+
+
+def _search_move(task):
+    global _search_id, _deadline
+    packed, move, depth, time_left, search_id = task
+    worker = _worker_ai
+    if search_id != _search_id:
+        _search_id = search_id
+        _deadline = None if time_left is None else time.perf_counter() + time_left
+        worker.transposition_table.new_search()
+        worker._new_search_ordering()
+    worker._reset_counters()
+    worker.deadline = _deadline
+
+    position = bitboard.Position.unpack(packed)
+    position.make_move(move)
+    worker.root_alpha = _shared_alpha.value
+    try:
+        score = worker._minimax(position, depth - 1, position.turn == bitboard.AI, worker.root_alpha,
+                                float('inf'))
+    except ai.SearchTimeout:
+        return move, None, worker.root_alpha, worker.counters()
+    # The alpha may have risen during the search; a score at or below the
+    # last one is only a bound
+    alpha = worker.root_alpha
+
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return move, score, alpha, worker.counters()
+
+
+class ParallelSearch:
+    def __init__(self, workers, options=None):
+        self.workers = workers
+        self.alpha = multiprocessing.Value("d", float('-inf'))
+        self.pool = multiprocessing.Pool(workers, _init_worker, (self.alpha, options or {}))
+        self.search_id = 0
+        # Search counters summed over the workers for the last root search
+        self.counters = {}
+
+    def search_root(self, position, moves, depth, deadline=None):
+        """Searches moves (best first) from position in the worker pool and
+        returns (best_move, best_score). Raises ai.SearchTimeout if any move
+        ran past the deadline."""
+        self.search_id += 1
+        self.alpha.value = float('-inf')
+        self.counters = dict.fromkeys(ai.AI.COUNTERS, 0)
+        packed = position.pack()
+        time_left = None if deadline is None else deadline - time.perf_counter()
+        tasks = [(packed, move, depth, time_left, self.search_id) for move in moves]
+
+        best_move = None
+        best_score = float('-inf')
+        timed_out = False
+        for move, score, alpha, counters in self.pool.imap_unordered(_search_move, tasks):
+            for name, value in counters.items():
+                self.counters[name] += value
+            if score is None:
+                timed_out = True
+            # A score at or below the alpha the move was searched with is only
+            # an upper bound, and some other move already scored at least that
+            elif score > alpha and score > best_score:
+                best_move, best_score = move, score
+        if timed_out:
+            raise ai.SearchTimeout()
+        return best_move, best_score
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
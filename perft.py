@@ -0,0 +1,135 @@
+import argparse
+import contextlib
+import copy
+import io
+import sys
+import time
+import bitboard
+import board
+
+# Perft: counts the leaf nodes of the full move tree to a fixed depth. The
+# counts check the move generator against known values and the time taken
+# gives its throughput in nodes per second.
+#
+#   python perft.py                      # check every position, bitboard generator
+#   python perft.py --generator board    # the same with Board.get_all_valid_moves
+#   python perft.py --fen "B:W6,14:B1" --depth 5 --divide
+
+# name: (FEN, known leaf counts for depth 1, 2, 3...). Captures are forced
+# and a multi-jump is one move, as in English draughts, so the start
+# position's counts are the published ones. The other counts are not from an
+# outside reference: they were produced by this generator and are kept to
+# catch regressions. The bitboard and Board generators agree on all of them.
+POSITIONS = {
+    "start": (
+        "W:W21,22,23,24,25,26,27,28,29,30,31,32:B1,2,3,4,5,6,7,8,9,10,11,12",
+        [7, 49, 302, 1469, 7361, 36768],
+    ),
+    # AI man on 1 with a branching chain of jumps through 6, 14/15 and 24
+    "multi-jump": (
+        "B:W6,14,15,24,29,31:B1,3,12",
+        [2, 12, 55, 293, 1042, 4368],
+    ),
+    # Player man jumps 11x2 onto the king row with 6 jumpable from there
+    "promotion": (
+        "W:W11,21,30:B6,7,13,K32",
+        [1, 5, 14, 53, 205, 801],
+    ),
+    # Two kings and two men a side and no capture at the root, so the kings'
+    # quiet steps forwards and backwards are generated from the first ply
+    "kings": (
+        "W:WK15,K22,29,32:BK3,K11,5,8",
+        [10, 29, 194, 1131, 8783, 53117],
+    ),
+}
+
+
+def perft(position, depth):
+    if depth == 0:
+        return 1
+    moves = position.get_all_valid_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move(undo)
+    return nodes
+
+
+def board_perft(game_board, depth):
+    if depth == 0:
+        return 1
+    moves = game_board.get_all_valid_moves(game_board.turn)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        child = copy.deepcopy(game_board)
+        child.apply_move(move)
+        nodes += board_perft(child, depth - 1)
+    return nodes
+
+
+def divide(position, depth):
+    """Leaf counts below each root move, for tracking down a wrong total."""
+    counts = {}
+    for move in position.get_all_valid_moves():
+        undo = position.make_move(move)
+        counts[move] = perft(position, depth - 1)
+        position.unmake_move(undo)
+    return counts
+
+
+def count(fen, depth, generator):
+    position = bitboard.Position.from_fen(fen)
+    if generator == "bitboard":
+        return perft(position, depth)
+    game_board = position.to_board(board.Board())
+    # Board.move_piece reports promotions and multi-jumps on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        return board_perft(game_board, depth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move generator perft")
+    parser.add_argument("--generator", choices=("bitboard", "board"), default="bitboard")
+    parser.add_argument("--depth", type=int, help="deepest depth to count (default: all known counts)")
+    parser.add_argument("--fen", help="count this position instead of the built-in ones")
+    parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    args = parser.parse_args()
+
+    if args.fen:
+        positions = {"fen": (args.fen, [])}
+    else:
+        positions = POSITIONS
+
+    failures = 0
+    for name, (fen, expected) in positions.items():
+        max_depth = args.depth or len(expected) or 1
+        print(f"{name}: {fen}")
+        if args.divide:
+            for move, nodes in sorted(divide(bitboard.Position.from_fen(fen), max_depth).items()):
+                print(f"  {bitboard.move_text(move)}: {nodes}")
+        for depth in range(1, max_depth + 1):
+            start = time.perf_counter()
+            nodes = count(fen, depth, args.generator)
+            seconds = time.perf_counter() - start
+            nps = nodes / seconds if seconds > 0 else 0
+            status = ""
+            if depth <= len(expected):
+                if nodes == expected[depth - 1]:
+                    status = "ok"
+                else:
+                    status = f"FAIL (expected {expected[depth - 1]})"
+                    failures += 1
+            print(f"  depth {depth}: {nodes:>10} nodes {seconds:8.3f}s {nps:>12,.0f} nps  {status}")
+
+    if failures:
+        print(f"{failures} perft count(s) differ from the known values")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import pygame
+import consts
+import pieces
+
+BACKGROUND_COLOR = (255, 165, 79)
+
+# Draws a board.Board in the pygame window. All rendering lives here so the
+# board and pieces stay free of pygame.
+#
+# Everything that doesn't change is drawn once: the window background and
+# board go into a static layer, and each piece and highlight into a cached
+# sprite. update() then only redraws the squares whose contents changed since
+# the last frame and returns their rects for pygame.display.update.
+class BoardRenderer:
+    def __init__(self, window):
+        self.window = window
+        self.initialize_board_background()
+        self.board_layer = self.render_board_layer()
+        self.piece_sprites = {piece: self.render_piece_sprite(pieces.player(piece), pieces.is_king(piece))
+                              for piece in pieces.ALL}
+        self.piece_highlight_sprite = self.render_piece_highlight_sprite()
+        self.square_highlight_sprites = {}
+        # (row, col) -> (piece, highlighted) last drawn on the square
+        self.drawn = {}
+
+    def initialize_board_background(self):
+        self.board_background_image = pygame.image.load("assets/board_background.png").convert_alpha()
+        self.board_background_image.set_alpha(100)
+        self.board_background_image = pygame.transform.scale(
+            self.board_background_image,
+            (consts.BOARD_SIZE * consts.SQUARE_SIZE, consts.BOARD_SIZE * consts.SQUARE_SIZE)
+        )
+
+    def render_board_layer(self):
+        layer = pygame.Surface(self.window.get_size()).convert()
+        layer.fill(BACKGROUND_COLOR)
+
+        board_shadow_surface = pygame.Surface((consts.BOARD_SIZE * consts.SQUARE_SIZE + 20,
+                                               consts.BOARD_SIZE * consts.SQUARE_SIZE + 20))
+        board_shadow_surface.set_colorkey((0, 0, 0))
+        board_shadow_surface.set_alpha(50)
+
+        # Draw Board Shadow
+        pygame.draw.rect(board_shadow_surface, (30, 30, 30),
+                         pygame.Rect(0, 0,
+                             consts.BOARD_SIZE * consts.SQUARE_SIZE + 20,
+                             consts.BOARD_SIZE * consts.SQUARE_SIZE + 20))
+        layer.blit(board_shadow_surface,
+                   (consts.X_CENTER_OFFSET - 5, consts.Y_CENTER_OFFSET - 5))
+        layer.blit(board_shadow_surface,
+                   (consts.X_CENTER_OFFSET, consts.Y_CENTER_OFFSET))
+        layer.blit(board_shadow_surface,
+                   (consts.X_CENTER_OFFSET - 2.5, consts.Y_CENTER_OFFSET - 2.5))
+        layer.blit(board_shadow_surface,
+                   (consts.X_CENTER_OFFSET - 7.5, consts.Y_CENTER_OFFSET - 7.5))
+
+        # Board Outline
+        pygame.draw.rect(layer, (139,69,19),
+                         (consts.X_CENTER_OFFSET - 10, consts.Y_CENTER_OFFSET - 10,
+                          consts.SQUARE_SIZE * 8 + 20, consts.SQUARE_SIZE * 8 + 20))
+        for row in range(consts.BOARD_SIZE):
+            for col in range(consts.BOARD_SIZE):
+                color = pygame.Color(215, 165, 97) if (row + col) % 2 == 0 else pygame.Color(165, 102, 37)
+                pygame.draw.rect(layer, color, self.square_rect(row, col))
+        layer.blit(self.board_background_image, (consts.X_CENTER_OFFSET, consts.Y_CENTER_OFFSET))
+        return layer
+
+    def render_piece_sprite(self, player, is_king):
+        # A square-sized sprite with the piece in its center
+        center = consts.SQUARE_SIZE / 2
+        outline_color = pygame.Color(234, 46, 30) if player == "AI" else pygame.Color(75, 75, 75)
+        inner_lining_color = pygame.Color(188, 6, 21) if player == "AI" else pygame.Color(62, 62, 62)
+        innermost_point_color = pygame.Color(234, 46, 30) if player == "AI" else pygame.Color(75, 75, 75)
+
+        sprite = pygame.Surface((consts.SQUARE_SIZE, consts.SQUARE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (30, 30, 30, 100), (center + 5, center + 5), consts.PIECE_RADIUS * 1.3) # Shadow
+        pygame.draw.circle(sprite, outline_color, (center, center), consts.PIECE_RADIUS * 1.3) # Outline
+        pygame.draw.circle(sprite, inner_lining_color, (center, center), consts.PIECE_RADIUS) # Inner Lining
+        pygame.draw.circle(sprite, innermost_point_color, (center, center), consts.PIECE_RADIUS / 2) # Innermost Point
+
+        # Add visual indication for a king
+        if is_king:
+            crown_color = "gold"
+            pygame.draw.circle(sprite, crown_color, (center, center), consts.PIECE_RADIUS / 2)
+        return sprite.convert_alpha()
+
+    def render_piece_highlight_sprite(self):
+        center = consts.SQUARE_SIZE / 2
+        sprite = pygame.Surface((consts.SQUARE_SIZE, consts.SQUARE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (255, 255, 255, 50), (center, center), consts.PIECE_RADIUS * 1.3)
+        return sprite.convert_alpha()
+
+    def square_highlight_sprite(self, color):
+        sprite = self.square_highlight_sprites.get(color)
+        if sprite is None:
+            sprite = pygame.Surface((consts.SQUARE_SIZE, consts.SQUARE_SIZE))
+            sprite.fill(color)
+            sprite.set_alpha(50)
+            sprite = self.square_highlight_sprites[color] = sprite.convert()
+        return sprite
+
+    def square_rect(self, row, col):
+        return pygame.Rect(col * consts.SQUARE_SIZE + consts.X_CENTER_OFFSET,
+                           row * consts.SQUARE_SIZE + consts.Y_CENTER_OFFSET,
+                           consts.SQUARE_SIZE, consts.SQUARE_SIZE)
+
+    def draw_board(self):
+        self.window.blit(self.board_layer, (0, 0))
+
+    def draw_pieces(self, board):
+        for row in range(consts.BOARD_SIZE):
+            for col in range(consts.BOARD_SIZE):
+                if board.boardArray[row][col] is not None:
+                    self.draw_piece(board.boardArray[row][col], row, col)
+
+    def draw_piece(self, piece, row, col):
+        self.window.blit(self.piece_sprites[piece], self.square_rect(row, col))
+
+    def highlight_piece(self, row, col):
+        self.window.blit(self.piece_highlight_sprite, self.square_rect(row, col))
+
+    def highlight(self, board, pos, color="green"):
+        row, col = pos
+        if board.boardArray[row][col] is not None:
+            self.highlight_piece(row, col)
+        else:
+            self.window.blit(self.square_highlight_sprite(color), self.square_rect(row, col))
+
+    def restore(self, rect):
+        """Puts the static layer back under rect and returns it. Squares it
+        overlaps are redrawn by the next update()."""
+        rect = pygame.Rect(rect)
+        self.window.blit(self.board_layer, rect, rect)
+        for square in list(self.drawn):
+            if rect.colliderect(self.square_rect(*square)):
+                del self.drawn[square]
+        return rect
+
+    def redraw(self):
+        """Draws the static layer over the whole window, after something else
+        was drawn over it, and returns the window's rect. The next update()
+        draws every square."""
+        self.draw_board()
+        self.drawn = {}
+        return self.window.get_rect()
+
+    def update(self, board, highlighted=()):
+        """Redraws the squares whose piece or highlight changed since the last
+        call, with highlighted holding the (row, col) squares to highlight,
+        and returns the rects to pass to pygame.display.update."""
+        dirty = []
+        for row in range(consts.BOARD_SIZE):
+            for col in range(consts.BOARD_SIZE):
+                piece = board.boardArray[row][col]
+                state = (piece, (row, col) in highlighted)
+                if self.drawn.get((row, col)) == state:
+                    continue
+                self.drawn[(row, col)] = state
+
+                rect = self.square_rect(row, col)
+                self.window.blit(self.board_layer, rect, rect)
+                if piece is not None:
+                    self.draw_piece(piece, row, col)
+                if state[1]:
+                    self.highlight(board, (row, col))
+                dirty.append(rect)
+        return dirty
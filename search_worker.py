@@ -0,0 +1,181 @@
+import multiprocessing
+import queue
+import traceback
+import ai
+import bitboard
+
+# Runs AI searches in a separate process so the pygame loop keeps drawing and
+# handling input while the AI thinks. The loop starts a search, polls for the
+# result once per frame, and cancels the search if the game is quit or
+# restarted. The worker keeps its AI between searches, so the transposition
+# table stays warm for the whole session.
+#
+# While the Player is thinking the worker can also ponder: it searches the
+# AI's answer to each Player reply, the one the last search predicted first,
+# until the Player moves. If the position was pondered the answer is sent
+# back at once, otherwise the search starts with a table full of its work.
+#
+# A search that fails in the worker, or a worker that dies, does not leave
+# the game waiting: a dead worker is restarted and given the search again a
+# few times, and a search that still fails ends with no move.
+
+# Times a search is sent again to a restarted worker
+MAX_RETRIES = 2
+
+
+def _run(commands, results, stop, latest):
+    searchers = {}
+    # Position hash -> AI move found for it while pondering
+    pondered = {}
+    while True:
+        command = commands.get()
+        if command is None:
+            return
+        kind, job_id, packed, options = command
+        if kind == "search":
+            stop.clear()
+            if job_id != latest.value:
+                # Cancelled or replaced while it waited in the queue
+                continue
+        try:
+            key = tuple(sorted(options.items()))
+            searcher = searchers.get(key)
+            if searcher is None:
+                searcher = searchers[key] = ai.AI(None, **options)
+                searcher.stop_event = stop
+            position = bitboard.Position.unpack(packed)
+
+            if kind == "ponder":
+                # stop is left as it is: if it is set, a newer request is
+                # already queued behind this one
+                pondered.clear()
+                _ponder(searcher, position, pondered, commands, stop)
+                continue
+
+            if position.hash in pondered:
+                move = pondered[position.hash]
+            else:
+                try:
+                    move = searcher.search(position)
+                except ai.SearchTimeout:
+                    move = None
+        except Exception as error:
+            traceback.print_exc()
+            pondered.clear()
+            if kind == "search":
+                results.put((job_id, None, f"{type(error).__name__}: {error}"))
+            continue
+        pondered.clear()
+        results.put((job_id, move, None))
+
+
+def _ponder(searcher, position, pondered, commands, stop):
+    # The last search stored its expected Player reply as the best move of
+    # this position, so that reply is searched first
+    entry = searcher.transposition_table.probe(position.hash)
+    predicted = entry[4] if entry is not None else None
+    replies = position.get_all_valid_moves(bitboard.PLAYER)
+    replies.sort(key=lambda reply: reply != predicted)
+    for reply in replies:
+        if stop.is_set() or not commands.empty():
+            return
+        child = position.play(reply)
+        try:
+            pondered[child.hash] = searcher.search(child)
+        except ai.SearchTimeout:
+            return
+
+
+class SearchWorker:
+    def __init__(self):
+        self.stop = multiprocessing.Event()
+        # Id of the one search the worker should run; queued searches with
+        # another id were cancelled or replaced and are skipped
+        self.latest = multiprocessing.Value("i", 0)
+        self._start_process()
+        self.job_id = 0
+        self.pending = None  # Id of the search in progress
+        self.job = None  # (packed position, options) of that search
+        self.retries = 0
+        self.pondering = False
+        self.best_move = None
+
+    def _start_process(self):
+        self.commands = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_run,
+                                               args=(self.commands, self.results, self.stop, self.latest),
+                                               daemon=True)
+        self.process.start()
+
+    def start_search(self, game_board, options):
+        """Starts searching the AI's move on game_board with the given
+        ai.AI keyword arguments."""
+        self._stop_pondering()
+        self.job_id += 1
+        self.pending = self.job_id
+        self.job = (bitboard.Position.from_board(game_board).pack(), options)
+        self.best_move = None
+        self.retries = 0
+        self.latest.value = self.job_id
+        self.commands.put(("search", self.job_id, *self.job))
+
+    def start_ponder(self, game_board, options):
+        """Lets the worker search ahead on the Player's turn until the next
+        start_search or cancel."""
+        self.pondering = True
+        self.commands.put(("ponder", None, bitboard.Position.from_board(game_board).pack(), options))
+
+    def _stop_pondering(self):
+        if self.pondering:
+            self.stop.set()
+            self.pondering = False
+
+    def is_thinking(self):
+        return not self.poll()
+
+    def poll(self):
+        """Returns True once the search has finished; best_move then holds
+        its move in Board coordinates, or None if the AI has no move."""
+        while self.pending is not None:
+            try:
+                job_id, move, error = self.results.get_nowait()
+            except queue.Empty:
+                if self.process.is_alive():
+                    return False
+                print("[DEBUG] search_worker.py: The search process died; restarting it.")
+                self._start_process()
+                self.pondering = False
+                if self.retries == MAX_RETRIES:
+                    print("[DEBUG] search_worker.py: Giving up on the search.")
+                    self._finish(None)
+                    break
+                self.retries += 1
+                self.commands.put(("search", self.pending, *self.job))
+                return False
+            # Results of cancelled searches can still arrive; skip them
+            if job_id == self.pending:
+                if error is not None:
+                    print(f"[DEBUG] search_worker.py: Search failed in the worker: {error}")
+                self._finish(move)
+        return True
+
+    def _finish(self, move):
+        self.pending = None
+        self.job = None
+        self.best_move = None if move is None else bitboard.Position.to_board_move(move)
+
+    def cancel(self):
+        self._stop_pondering()
+        if self.pending is not None:
+            self.latest.value = 0
+            self.stop.set()
+            self.pending = None
+            self.job = None
+
+    def close(self):
+        self.cancel()
+        self.commands.put(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,339 @@
+import argparse
+import array
+import itertools
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+import bitboard
+
+# Endgame tablebases: the exact result of every position with few pieces, and
+# how many plies the winner needs to end the game, computed by retrograde
+# analysis under the move rules of bitboard.Position.
+#
+# There is one table per material signature (AI men, AI kings, Player men,
+# Player kings). A position's index is built from the combinatorial rank of
+# each group's squares and the side to move; each entry is a 16-bit value
+# holding the result in its low two bits and the distance above them. Tables
+# are memory-mapped when they are loaded.
+#
+#   python tablebase.py generate --pieces 3
+#   python tablebase.py probe --fen "W:WK14:BK10,K18"
+
+DEFAULT_DIRECTORY = "tablebases"
+
+MAGIC = b"CKTB"
+FORMAT_VERSION = 1
+# magic, format version, rules version, AI men, AI kings, Player men,
+# Player kings, entry count
+HEADER = struct.Struct("<4sHHBBBBI")
+ENTRY = struct.Struct("<H")
+
+# Results, from the AI's point of view where it matters
+DRAW = 0
+AI_WIN = 1
+PLAYER_WIN = 2
+# Indices where two groups share a square
+INVALID = 3
+
+WINS = {bitboard.AI: AI_WIN, bitboard.PLAYER: PLAYER_WIN}
+
+
+class TablebaseError(Exception):
+    pass
+
+
+def _rank(bits):
+    # Combinatorial number system: the k-th lowest square s adds C(s, k)
+    rank = 0
+    for k, square in enumerate(bitboard.iter_squares(bits), 1):
+        rank += math.comb(square, k)
+    return rank
+
+
+def material_of(position):
+    return (bitboard.popcount(position.ai & ~position.kings), bitboard.popcount(position.ai & position.kings),
+            bitboard.popcount(position.player & ~position.kings), bitboard.popcount(position.player & position.kings))
+
+
+def table_size(material):
+    size = 2
+    for count in material:
+        size *= math.comb(bitboard.SQUARES, count)
+    return size
+
+
+def index_of(position, material):
+    index = 0
+    for bits, count in zip((position.ai & ~position.kings, position.ai & position.kings,
+                            position.player & ~position.kings, position.player & position.kings), material):
+        index = index * math.comb(bitboard.SQUARES, count) + _rank(bits)
+    return index * 2 + (position.turn == bitboard.AI)
+
+
+def file_name(material):
+    return "{}-{}-{}-{}.tb".format(*material)
+
+
+def _terminal_result(position):
+    # The same order as Board.check_winner: the AI is checked first, and a
+    # side without moves (or pieces) loses whoever is to move
+    if not position.has_moves(bitboard.AI):
+        return PLAYER_WIN
+    if not position.has_moves(bitboard.PLAYER):
+        return AI_WIN
+    return None
+
+
+class Table:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise TablebaseError(f"{path} is not a tablebase")
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise TablebaseError(f"{path} is not a tablebase")
+        magic, format_version, rules_version, *material, entries = HEADER.unpack_from(self.data, 0)
+        self.material = tuple(material)
+        if magic != MAGIC or format_version != FORMAT_VERSION or entries != table_size(self.material) or \
+           len(self.data) != HEADER.size + entries * ENTRY.size:
+            self.close()
+            raise TablebaseError(f"{path} is not a tablebase")
+        if rules_version != bitboard.RULES_VERSION:
+            self.close()
+            raise TablebaseError(f"{path} was generated for rules version {rules_version}, "
+                                 f"not {bitboard.RULES_VERSION}")
+
+    def __getitem__(self, index):
+        return ENTRY.unpack_from(self.data, HEADER.size + index * ENTRY.size)[0]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+class Tablebases:
+    """The tables in a directory. Every table is opened and checked up front,
+    so an outdated or damaged file is left out instead of failing a probe in
+    the middle of a search."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}
+        self.max_pieces = 0
+        for name in sorted(os.listdir(directory)):
+            material = _parse_file_name(name)
+            if material is None:
+                continue
+            try:
+                table = Table(os.path.join(directory, name))
+            except (OSError, TablebaseError) as error:
+                print(f"[DEBUG] tablebase.py: {error}")
+                continue
+            if table.material != material:
+                table.close()
+                print(f"[DEBUG] tablebase.py: {name} holds the table of {file_name(table.material)}")
+                continue
+            self.tables[material] = table
+            self.max_pieces = max(self.max_pieces, sum(material))
+
+    def probe(self, position):
+        """Returns (result, distance in plies) for position, or None if it is
+        not covered."""
+        if not position.ai:
+            return PLAYER_WIN, 0
+        if not position.player:
+            return AI_WIN, 0
+        material = material_of(position)
+        if material not in self.tables:
+            return None
+        entry = self.tables[material][index_of(position, material)]
+        return entry & 3, entry >> 2
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        self.tables = {}
+        self.max_pieces = 0
+
+
+def _parse_file_name(name):
+    if not name.endswith(".tb"):
+        return None
+    try:
+        material = tuple(int(count) for count in name[:-3].split("-"))
+    except ValueError:
+        return None
+    return material if len(material) == 4 else None
+
+
+def load(directory):
+    """Opens the tablebases in directory, or returns None if there are no
+    usable tables there."""
+    if not os.path.isdir(directory):
+        return None
+    tablebases = Tablebases(directory)
+    if not tablebases.tables:
+        return None
+    return tablebases
+
+
+# Generation
+#
+# The positions of a table and their moves form a graph. Children outside the
+# table (after a capture or a promotion) are looked up in the smaller tables
+# generated before it. Results are then propagated backwards from the known
+# ones in order of distance: a position is won for the side to move as soon
+# as one child is won for it, and lost once every child is lost for it. What
+# is never reached is a draw.
+
+def materials(max_pieces):
+    """Material signatures with both sides on the board, in an order where
+    captures and promotions only lead to earlier tables."""
+    signatures = [material for material in itertools.product(range(max_pieces), repeat=4)
+                  if 2 <= sum(material) <= max_pieces and material[0] + material[1] and material[2] + material[3]]
+    return sorted(signatures, key=lambda material: (sum(material), material[0] + material[2]))
+
+
+def _positions(material):
+    am, ak, pm, pk = material
+    squares = range(bitboard.SQUARES)
+    for ai_men in itertools.combinations(squares, am):
+        for ai_kings in itertools.combinations(squares, ak):
+            for player_men in itertools.combinations(squares, pm):
+                for player_kings in itertools.combinations(squares, pk):
+                    occupied = ai_men + ai_kings + player_men + player_kings
+                    if len(set(occupied)) != len(occupied):
+                        continue
+                    ai = sum(1 << square for square in ai_men + ai_kings)
+                    player = sum(1 << square for square in player_men + player_kings)
+                    kings = sum(1 << square for square in ai_kings + player_kings)
+                    for turn in (bitboard.PLAYER, bitboard.AI):
+                        yield bitboard.Position(ai, player, kings, turn)
+
+
+def generate_table(material, solved):
+    """Solves the table of material; solved maps the materials it can reach
+    to their entries. Returns the table's entries."""
+    entries = array.array("H", [INVALID]) * table_size(material)
+    win_of = {}
+    predecessors = {}
+    unresolved_children = {}
+    longest_loss = {}
+    # Positions with a child that is drawn or won for the side to move
+    not_lost = set()
+    # buckets[d]: (index, result) found at distance d
+    buckets = [[]]
+
+    def schedule(distance, index, result):
+        while len(buckets) <= distance:
+            buckets.append([])
+        buckets[distance].append((index, result))
+
+    for position in _positions(material):
+        index = index_of(position, material)
+        entries[index] = DRAW
+        result = _terminal_result(position)
+        if result is not None:
+            schedule(0, index, result)
+            continue
+
+        win = win_of[index] = WINS[position.turn]
+        children = 0
+        longest_loss[index] = -1
+        for move in position.get_all_valid_moves():
+            child = position.play(move)
+            child_material = material_of(child)
+            if child_material == material:
+                predecessors.setdefault(index_of(child, material), []).append(index)
+                children += 1
+                continue
+            if not child.ai:
+                result, distance = PLAYER_WIN, 0
+            elif not child.player:
+                result, distance = AI_WIN, 0
+            else:
+                entry = solved[child_material][index_of(child, child_material)]
+                result, distance = entry & 3, entry >> 2
+            if result == win:
+                schedule(distance + 1, index, win)
+                not_lost.add(index)
+            elif result == DRAW:
+                not_lost.add(index)
+            else:
+                longest_loss[index] = max(longest_loss[index], distance)
+        unresolved_children[index] = children
+        if not children and index not in not_lost:
+            schedule(longest_loss[index] + 1, index, AI_WIN if win == PLAYER_WIN else PLAYER_WIN)
+
+    resolved = set()
+    distance = 0
+    while distance < len(buckets):
+        for index, result in buckets[distance]:
+            if index in resolved:
+                continue
+            resolved.add(index)
+            entries[index] = distance << 2 | result
+            for parent in predecessors.get(index, ()):
+                if parent in resolved:
+                    continue
+                if result == win_of[parent]:
+                    schedule(distance + 1, parent, result)
+                    continue
+                unresolved_children[parent] -= 1
+                longest_loss[parent] = max(longest_loss[parent], distance)
+                if not unresolved_children[parent] and parent not in not_lost:
+                    schedule(longest_loss[parent] + 1, parent, result)
+        distance += 1
+    return entries
+
+
+def write_table(directory, material, entries):
+    with open(os.path.join(directory, file_name(material)), "wb") as table_file:
+        table_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, bitboard.RULES_VERSION, *material, len(entries)))
+        if sys.byteorder != "little":
+            entries = array.array("H", entries)
+            entries.byteswap()
+        entries.tofile(table_file)
+
+
+def generate(max_pieces, directory=DEFAULT_DIRECTORY):
+    os.makedirs(directory, exist_ok=True)
+    solved = {}
+    for material in materials(max_pieces):
+        start = time.perf_counter()
+        solved[material] = generate_table(material, solved)
+        write_table(directory, material, solved[material])
+        print(f"{file_name(material)}: {len(solved[material])} entries in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or probe endgame tablebases")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_parser = commands.add_parser("generate", help="generate the tables for up to --pieces pieces")
+    generate_parser.add_argument("--pieces", type=int, default=3)
+    generate_parser.add_argument("--directory", default=DEFAULT_DIRECTORY)
+    probe_parser = commands.add_parser("probe", help="look up a position")
+    probe_parser.add_argument("--fen", required=True)
+    probe_parser.add_argument("--directory", default=DEFAULT_DIRECTORY)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.pieces, args.directory)
+    else:
+        tablebases = load(args.directory)
+        found = tablebases.probe(bitboard.Position.from_fen(args.fen)) if tablebases is not None else None
+        if found is None:
+            print("not in the tablebases")
+        else:
+            result, distance = found
+            print(f"{('draw', 'AI wins', 'Player wins')[result]} in {distance} plies")
+
+
+if __name__ == "__main__":
+    main()
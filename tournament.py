@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+import ai
+import board
+
+# Headless self-play tournament between two AI settings, played on Board with
+# ai.AI as in the game. Each opening (a few random moves from the start) is
+# played twice with the engines swapping sides, and the games are spread over
+# a process pool.
+#
+#   python tournament.py --games 1000 --first level=hard --second depth=2,time_limit_ms=50
+#   python tournament.py --first mobility_weight=0.2 --second mobility_weight=0.1 --output report.json
+
+SIDES = ("AI", "Player")
+
+
+def parse_settings(text):
+    """"depth=4,time_limit_ms=100" -> ai.AI keyword arguments."""
+    settings = {}
+    for item in filter(None, text.split(",")):
+        name, _, value = item.partition("=")
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+        else:
+            if value in ("True", "False", "None"):
+                value = {"True": True, "False": False, "None": None}[value]
+        settings[name.strip()] = value
+    return settings
+
+
+def play_game(task):
+    """Plays one game; the first engine plays the AI side if first_side is
+    "AI". Returns the winner as "first", "second" or None for a draw, and the
+    (seconds, moves) each engine spent."""
+    first, second, first_side, opening_seed, random_plies, max_plies = task
+    game_board = board.Board()
+    second_side = "Player" if first_side == "AI" else "AI"
+    engines = {first_side: ai.AI(game_board, side=first_side, **first),
+               second_side: ai.AI(game_board, side=second_side, **second)}
+    names = {first_side: "first", second_side: "second"}
+    thinking = {"first": [0.0, 0], "second": [0.0, 0]}
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        # The evaluation noise is seeded too, so a game can be replayed
+        random.seed(opening_seed)
+        rng = random.Random(opening_seed)
+        winner = None
+        for ply in range(max_plies):
+            winner = game_board.check_winner()
+            if winner:
+                break
+            if ply < random_plies:
+                move = rng.choice(game_board.get_all_valid_moves(game_board.turn))
+            else:
+                engine = engines[game_board.turn]
+                start = time.perf_counter()
+                move = engine.get_best_move()
+                spent = thinking[names[game_board.turn]]
+                spent[0] += time.perf_counter() - start
+                spent[1] += 1
+                if move is None:
+                    winner = second_side if game_board.turn == first_side else first_side
+                    break
+            game_board.apply_move(move)
+        else:
+            winner = game_board.check_winner()
+        for engine in engines.values():
+            engine.close()
+    return (names[winner] if winner else None), thinking
+
+
+def elo(score):
+    if score <= 0:
+        return float('-inf')
+    if score >= 1:
+        return float('inf')
+    return 400 * math.log10(score / (1 - score))
+
+
+def wilson_interval(score, games, z=1.96):
+    """95% Wilson interval of the mean game score. Unlike the normal
+    approximation it keeps its width when every game went one way."""
+    if not games:
+        return 0.0, 1.0
+    denominator = 1 + z * z / games
+    center = (score + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(score * (1 - score) / games + z * z / (4 * games * games)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def report(results, first, second):
+    """Win/draw/loss of the first engine, its Elo difference with a 95%
+    interval, and the time each engine spent per move."""
+    games = len(results)
+    wins = sum(1 for winner, _ in results if winner == "first")
+    losses = sum(1 for winner, _ in results if winner == "second")
+    draws = games - wins - losses
+    score = (wins + draws / 2) / games if games else 0.5
+    low, high = wilson_interval(score, games)
+    # A score of 0 or 1 has no finite Elo; such scores are taken as half a
+    # game away from it, which keeps the report finite and valid JSON
+    limit = 0.5 / games if games else 0.5
+
+    def rating(value):
+        return elo(min(max(value, limit), 1 - limit))
+
+    move_ms = {}
+    for name in ("first", "second"):
+        seconds = sum(thinking[name][0] for _, thinking in results)
+        moves = sum(thinking[name][1] for _, thinking in results)
+        move_ms[name] = 1000 * seconds / moves if moves else 0.0
+
+    return {"first": first, "second": second, "games": games, "wins": wins, "draws": draws, "losses": losses,
+            "score": score, "elo": rating(score), "elo_low": rating(low), "elo_high": rating(high),
+            "first_ms_per_move": move_ms["first"], "second_ms_per_move": move_ms["second"]}
+
+
+def run(first, second, games, workers=None, random_plies=4, max_plies=200, seed=0):
+    tasks = []
+    for game in range(games):
+        # Games come in pairs that share an opening, with sides swapped
+        tasks.append((first, second, SIDES[game % 2], seed + game // 2, random_plies, max_plies))
+    results = []
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(play_game, tasks):
+            results.append(result)
+            print(f"\r{len(results)}/{games} games", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    return report(results, first, second)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AI settings against each other")
+    parser.add_argument("--first", default="level=hard", help="ai.AI settings, e.g. depth=4,time_limit_ms=100")
+    parser.add_argument("--second", default="level=medium")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, help="processes to play in (default: one per CPU)")
+    parser.add_argument("--random-plies", type=int, default=4, help="random moves that open each game")
+    parser.add_argument("--max-plies", type=int, default=200, help="plies after which a game is drawn")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the report to as JSON")
+    args = parser.parse_args()
+
+    result = run(parse_settings(args.first), parse_settings(args.second), args.games, args.workers,
+                 args.random_plies, args.max_plies, args.seed)
+    print(f"{args.first} vs {args.second}: +{result['wins']} ={result['draws']} -{result['losses']} "
+          f"in {result['games']} games")
+    print(f"Elo {result['elo']:+.0f} ({result['elo_low']:+.0f} to {result['elo_high']:+.0f})")
+    print(f"ms per move: {result['first_ms_per_move']:.1f} vs {result['second_ms_per_move']:.1f}")
+    if args.output:
+        with open(args.output, "w") as report_file:
+            json.dump(result, report_file, indent=2)
+            report_file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import mmap
+import os
+import struct
+import bitboard
+
+# Bound types stored with each score
+EXACT = 0
+LOWER_BOUND = 1  # The search failed high, the true score is at least this
+UPPER_BOUND = 2  # The search failed low, the true score is at most this
+
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by Zobrist hash.
+
+    Each bucket has two slots: the first keeps the deepest result seen in the
+    current search (depth-preferred), the second always takes the newest one.
+    Entries are (key, depth, bound, score, best_move, age) tuples, so memory
+    stays capped at the number of slots however many games are played.
+    """
+
+    def __init__(self, size=1 << 16):
+        # Number of buckets, rounded down to a power of two for masking
+        self.buckets = 1 << (max(1, size).bit_length() - 1)
+        self.mask = self.buckets - 1
+        self.slots = [None] * (2 * self.buckets)
+        self.age = 0
+
+    def new_search(self):
+        """Marks existing entries as stale so they can be replaced first."""
+        self.age += 1
+
+    def clear(self):
+        self.slots = [None] * (2 * self.buckets)
+
+    def probe(self, key):
+        index = (key & self.mask) << 1
+        entry = self.slots[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.slots[index + 1]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, score, best_move):
+        index = (key & self.mask) << 1
+        entry = (key, depth, bound, score, best_move, self.age)
+        deepest = self.slots[index]
+        if deepest is None or deepest[0] == key or deepest[5] != self.age or depth >= deepest[1]:
+            self.slots[index] = entry
+        else:
+            self.slots[index + 1] = entry
+
+    def __len__(self):
+        return sum(1 for entry in self.slots if entry is not None)
+
+
+# Memory-mapped table file: a header, then the slots of each bucket in order.
+# Each slot holds check, score, move, depth, bound, age; check is the key
+# XORed with the three data words after it, so a slot read while another
+# process was writing it (or one never written) fails the key comparison and
+# is taken as a miss. The move is packed with bitboard.pack_move, and moves
+# too long for it are stored as None.
+#
+# The search generation that ages entries is kept in the header too, so every
+# process sharing the file, and every later run, agrees on which entries are
+# from the current search.
+MAGIC = b"CKTT"
+FORMAT_VERSION = 3
+# magic, format version, rules version, bucket count, generation
+HEADER = struct.Struct("<4sHHII")
+GENERATION = struct.Struct("<I")
+GENERATION_OFFSET = HEADER.size - GENERATION.size
+SLOT = struct.Struct("<QdQhBH3x")
+SLOT_WORDS = struct.Struct("<QQQQ")
+
+
+def _file_size(buckets):
+    return HEADER.size + 2 * buckets * SLOT.size
+
+
+def _file_buckets(path):
+    # The bucket count of a valid table file, else None
+    try:
+        with open(path, "rb") as table_file:
+            header = table_file.read(HEADER.size)
+            size = os.fstat(table_file.fileno()).st_size
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, format_version, rules_version, buckets, _ = HEADER.unpack(header)
+    if magic != MAGIC or format_version != FORMAT_VERSION or rules_version != bitboard.RULES_VERSION or \
+       not buckets or buckets & (buckets - 1) or size != _file_size(buckets):
+        return None
+    return buckets
+
+
+class PersistentTranspositionTable:
+    """A TranspositionTable kept in a memory-mapped file instead of memory.
+
+    The file outlives the process, so a new game or a restarted program
+    starts from the results of earlier searches, and processes that open the
+    same file share its entries as they are written. Writers take no lock:
+    each slot carries a checksum, and a torn or overwritten slot is simply a
+    miss. Only AIs with the same evaluation settings should share a file.
+    """
+
+    def __init__(self, path, size=1 << 16):
+        self.path = path
+        buckets = _file_buckets(path)
+        if buckets is None:
+            # New, foreign or outdated: start an empty file. It is built
+            # aside and renamed into place, so a process still mapping the
+            # old file is not cut short
+            buckets = 1 << (max(1, size).bit_length() - 1)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as table_file:
+                table_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, bitboard.RULES_VERSION, buckets, 0))
+                table_file.truncate(_file_size(buckets))
+            os.replace(temporary, path)
+        # Otherwise the size the file was made with wins, so its users agree
+        self.buckets = buckets
+        self.mask = self.buckets - 1
+        self.file = open(path, "r+b")
+        self.data = mmap.mmap(self.file.fileno(), _file_size(self.buckets))
+
+    @property
+    def age(self):
+        # Slots hold the low 16 bits of the file's generation
+        return GENERATION.unpack_from(self.data, GENERATION_OFFSET)[0] & 0xFFFF
+
+    def new_search(self):
+        # Unlocked: two processes starting a search together may bump it
+        # once, which only makes their entries share an age
+        generation = GENERATION.unpack_from(self.data, GENERATION_OFFSET)[0]
+        GENERATION.pack_into(self.data, GENERATION_OFFSET, (generation + 1) & 0xFFFFFFFF)
+
+    def clear(self):
+        self.data[HEADER.size:] = bytes(len(self.data) - HEADER.size)
+
+    def _read(self, slot, key):
+        offset = HEADER.size + slot * SLOT.size
+        raw = self.data[offset:offset + SLOT.size]
+        check, *data = SLOT_WORDS.unpack(raw)
+        if check ^ data[0] ^ data[1] ^ data[2] != key:
+            return None
+        _, score, move, depth, bound, age = SLOT.unpack(raw)
+        return key, depth, bound, score, bitboard.unpack_move(move), age
+
+    def probe(self, key):
+        slot = (key & self.mask) << 1
+        entry = self._read(slot, key)
+        if entry is None:
+            entry = self._read(slot + 1, key)
+        return entry
+
+    def _occupant(self, slot):
+        # The depth and age of whatever a slot holds, without knowing its key
+        _, _, _, depth, _, age = SLOT.unpack_from(self.data, HEADER.size + slot * SLOT.size)
+        return depth, age
+
+    def store(self, key, depth, bound, score, best_move):
+        slot = (key & self.mask) << 1
+        age = self.age
+        raw = bytearray(SLOT.pack(0, score, bitboard.pack_move(best_move), depth, bound, age))
+        _, *data = SLOT_WORDS.unpack(raw)
+        SLOT_WORDS.pack_into(raw, 0, key ^ data[0] ^ data[1] ^ data[2], *data)
+        deepest_depth, deepest_age = self._occupant(slot)
+        if self._read(slot, key) is not None or deepest_age != age or depth >= deepest_depth:
+            offset = HEADER.size + slot * SLOT.size
+        else:
+            offset = HEADER.size + (slot + 1) * SLOT.size
+        self.data[offset:offset + SLOT.size] = raw
+
+    def __len__(self):
+        return sum(1 for offset in range(HEADER.size, len(self.data), SLOT.size)
+                   if self.data[offset:offset + SLOT.size] != bytes(SLOT.size))
+
+    def flush(self):
+        self.data.flush()
+
+    def close(self):
+        self.data.flush()
+        self.data.close()
+        self.file.close()